@@ -3,22 +3,32 @@ from __future__ import annotations
 import logging
 import re
 from abc import ABC, abstractmethod
-from collections.abc import Callable, Generator
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import cached_property
-from typing import Any
+from typing import Any, TypeVar
 
 import canvasapi
-from canvasapi.exceptions import InvalidAccessToken, ResourceDoesNotExist
+from canvasapi.exceptions import (
+    CanvasException,
+    InvalidAccessToken,
+    ResourceDoesNotExist,
+)
+from canvasapi.paginated_list import PaginatedList
 from requests.exceptions import ConnectionError, MissingSchema
 
-from cansync import utils
+from cansync import profiling, utils
+from cansync.const import COURSE_ENROLLMENT_STATES
+from cansync.retry import RetryPolicy, RetrySession
+from cansync.transfer import Downloader, DownloadOptions
 from cansync.types import (
     Course,
     CourseInfo,
-    File,
+    FileRecord,
+    Folder,
     Module,
-    ModuleItem,
+    ModuleItemRecord,
     ModuleItemType,
     Page,
     Quiz,
@@ -26,6 +36,35 @@ from cansync.types import (
 
 logger = logging.getLogger(__name__)
 
+_RESOURCES = ("files", "quizzes")
+_PAGE_SIZE = 100
+# INFO: Page requests only ever wait on the network, a few threads cover nested lists
+_page_pool = ThreadPoolExecutor(4, thread_name_prefix="cansync-pages")
+
+T = TypeVar("T")
+
+
+def paginate(items: Iterable[T]) -> Generator[T, None, None]:
+    """
+    Iterate a canvasapi paginated list while the page after the current one is
+    already being requested, so consuming a page hides the round trip for the next
+    one instead of stalling on it. Pages are requested as large as Canvas allows
+    and followed through their ``Link`` headers by canvasapi itself, they aren't kept
+    on the list afterwards so it can only be iterated once
+    """
+    if not isinstance(items, PaginatedList):
+        yield from items
+        return
+
+    items._next_params.setdefault("per_page", _PAGE_SIZE)
+    yield from items._elements  # INFO: Anything canvasapi already fetched
+    future = _page_pool.submit(items._get_next_page) if items._has_next() else None
+    while future is not None:
+        page = future.result()
+        # INFO: The next url is only known once the current page has arrived
+        future = _page_pool.submit(items._get_next_page) if items._has_next() else None
+        yield from page
+
 
 class Canvas:
     """
@@ -38,14 +77,25 @@ class Canvas:
 
     def __init__(self):
         self._canvas = None
+        self._user = None
+        self.session: RetrySession | None = None
+        self.downloader: Downloader | None = None
+        self._files: dict[int, FileRecord] = {}
         self.local_config = utils.get_config()
 
+    @profiling.timed("connect")
     def connect(self) -> bool:
         logger.info("Starting canvasapi.Canvas instance")
         try:
             config = utils.get_config()
             self._canvas = canvasapi.Canvas(config["url"], config["api_key"])
-            self._canvas.get_current_user()  # INFO: Test request
+            # INFO: Every canvasapi object shares this requester and so this session
+            self.session = RetrySession(RetryPolicy.from_config(config))
+            self._canvas._Canvas__requester._session = self.session
+            self.downloader = Downloader(
+                self.session, config["api_key"], DownloadOptions.from_config(config)
+            )
+            self._user = self._canvas.get_current_user()  # INFO: Test request
             return True
         except (
             InvalidAccessToken,
@@ -57,12 +107,53 @@ class Canvas:
             self._canvas = None
             return False
 
+    def disconnect(self) -> None:
+        """Forget the connection so the next ``connect`` starts a new one"""
+        if self.session is not None:
+            self.session.close()
+        self._canvas = None
+        self._user = None
+        self.session = None
+        self.downloader = None
+
     @property
     def connected(self) -> bool:
         return self._canvas is not None
 
-    def get_file(self, id: int) -> File:
-        return self._canvas.get_file(id)
+    def reload_config(self) -> None:
+        self.local_config = utils.get_config()
+
+    def get_file(self, id: int) -> FileRecord:
+        """
+        File metadata is kept for the lifetime of the instance so files linked from
+        several places, or seen on an earlier poll, are only requested once
+        """
+        id = int(id)
+        if id not in self._files:
+            self._files[id] = FileRecord.from_file(self._canvas.get_file(id))
+        return self._files[id]
+
+    def get_activity(self) -> dict[int, str]:
+        """
+        Latest activity stream timestamp for each course the user can see, uses a
+        single request for every course
+
+        :returns: Course ID mapped to an ISO 8601 timestamp
+        """
+        response = self._user._requester.request(
+            "GET", "users/self/activity_stream", per_page=100
+        )
+        activity: dict[int, str] = {}
+        for item in response.json():
+            id, updated_at = item.get("course_id"), item.get("updated_at")
+            if id is None or updated_at is None:
+                continue
+            activity[id] = max(activity.get(id, updated_at), updated_at)
+        return activity
+
+    def cache_file(self, file: FileRecord) -> None:
+        """Keep file metadata that came from a listing so get_file doesn't request it"""
+        self._files[file.id] = file
 
     def get_courses(self) -> Generator[CourseScan, None, None]:
         for id in self.local_config["course_ids"]:
@@ -72,12 +163,19 @@ class Canvas:
         return CourseScan(self._canvas.get_course(id), self)
 
     def get_courses_info(self) -> Generator[CourseInfo, None, None]:
-        courses = self._canvas.get_courses()
-        for course in courses:
-            if not hasattr(course, "name"):
-                # this is dumber than that other thing
-                continue
-            yield CourseInfo(course.name, course.id)
+        """
+        Courses the user is currently enrolled in, past enrollments are left out since
+        staff accounts can have hundreds of them
+        """
+        seen: set[int] = set()
+        for state in COURSE_ENROLLMENT_STATES:
+            courses = self._canvas.get_courses(enrollment_state=state)
+            for course in paginate(courses):
+                if not hasattr(course, "name") or course.id in seen:
+                    # this is dumber than that other thing
+                    continue
+                seen.add(course.id)
+                yield CourseInfo(course.name, course.id)
 
     def get_quiz(self, id: int) -> Generator[Quiz, None, None]:
         return self._canvas.get_quiz(id)
@@ -126,13 +224,96 @@ class CourseScan(Scanner):
     def resource_regex(self) -> str:
         return rf"{self.canvas.local_config['url']}/(api/v1/)?courses/{self.id}/{{}}/([0-9]+)"
 
+    @cached_property
+    def resource_pattern(self) -> re.Pattern[str]:
+        """Matches links to any of the scanned resource types"""
+        return re.compile(self.resource_regex.format(f"({'|'.join(_RESOURCES)})"))
+
+    @cached_property
+    def modules(self) -> list[ModuleScan]:
+        # INFO: Items are returned inline when there aren't too many of them
+        return [
+            ModuleScan(module, self, self.canvas)
+            for module in paginate(self.course.get_modules(include=["items"]))
+        ]
+
     def get_modules(self) -> Generator[ModuleScan, None, None]:
-        for module in self.course.get_modules():
-            yield ModuleScan(module, self, self.canvas)
+        yield from self.modules
 
     def get_page(self, url: str) -> Page:
         return self.course.get_page(url)
 
+    @cached_property
+    def page_updates(self) -> dict[str, str]:
+        """
+        Last update time of every page in the course from the page listing, which
+        doesn't include page bodies
+        """
+        try:
+            pages = paginate(self.course.get_pages())
+            return {page.url: page.updated_at for page in pages}
+        except CanvasException as e:
+            logger.debug("Can't list pages of Course(%s) (%s)", self.id, e)
+            return {}
+
+    @cached_property
+    def latest_file_update(self) -> str | None:
+        """Last update time of any file in the course, only one file is requested"""
+        files = self.course.get_files(sort="updated_at", order="desc", per_page=1)
+        try:
+            return next(iter(files)).updated_at
+        except StopIteration:
+            return None
+        except CanvasException as e:
+            logger.debug("Can't list files of Course(%s) (%s)", self.id, e)
+            return None
+
+    @cached_property
+    def folders(self) -> dict[int, FolderScan]:
+        """Every folder in the course's Files area, which can be hidden from students"""
+        try:
+            return {
+                folder.id: FolderScan(folder, self, self.canvas)
+                for folder in paginate(self.course.get_folders())
+            }
+        except CanvasException as e:
+            logger.debug("Can't list folders of Course(%s) (%s)", self.id, e)
+            return {}
+
+    def get_folder_files(self) -> Generator[tuple[FolderScan, FileRecord], None, None]:
+        """
+        Every file in the course's Files area along with its folder, from a single
+        listing instead of a request per file. Errors part way through the listing
+        are raised so a partial listing is never taken for the whole Files area
+        """
+        if not self.folders:
+            return
+
+        for file in paginate(self.course.get_files()):
+            record = FileRecord.from_file(file)
+            self.canvas.cache_file(record)
+            folder = self.folders.get(file.folder_id)
+            if folder is not None:
+                yield folder, record
+
+    def folders_signature(self) -> str:
+        """Changes whenever a file in the Files area is added, removed or changed"""
+        return utils.digest(
+            [
+                (id, f.folder.full_name, f.folder.files_count, f.folder.updated_at)
+                for id, f in self.folders.items()
+            ],
+            self.latest_file_update,
+        )
+
+    def signature(self) -> str:
+        """Changes whenever a module, page or file in the course changes"""
+        return utils.digest(
+            [module.signature() for module in self.modules],
+            self.page_updates,
+            self.latest_file_update,
+        )
+
 
 @dataclass
 class ModuleScan(Scanner):
@@ -154,21 +335,46 @@ class ModuleScan(Scanner):
         return self.module.id
 
     @cached_property
-    def items(self) -> list[ModuleItem]:
-        return list(self.module.get_module_items())
-
-    def items_by_type(self, type: ModuleItemType) -> Generator[ModuleItem, None, None]:
+    def items(self) -> list[ModuleItemRecord]:
+        # INFO: Inline items are raw dicts, don't keep them around after this
+        inline = self.module.__dict__.pop("items", None)
+        if not isinstance(inline, list):
+            items = paginate(self.module.get_module_items())
+            inline = [item.__dict__ for item in items]
+        return [ModuleItemRecord.from_dict(item) for item in inline]
+
+    def signature(self) -> str:
+        """Changes whenever an item is added, removed or edited or a page is updated"""
+        return utils.digest(
+            [item[:4] for item in self.items],
+            [
+                self.course.page_updates.get(item.page_url)
+                for item in self.items_by_type(ModuleItemType.PAGE)
+            ],
+        )
+
+    def items_by_type(
+        self, type: ModuleItemType
+    ) -> Generator[ModuleItemRecord, None, None]:
         yield from filter(lambda item: ModuleItemType(item.type) is type, self.items)
 
-    def get_pages(self) -> Generator[PageScan, None, None]:
+    def get_pages(
+        self, skip: Callable[[str], bool] | None = None
+    ) -> Generator[PageScan, None, None]:
+        """
+        :param skip: Called with each page url, pages it returns True for are not
+            requested
+        """
         for item in self.items_by_type(ModuleItemType.PAGE):
+            if skip is not None and skip(item.page_url):
+                continue
             yield PageScan(
                 self.course.get_page(item.page_url),
                 self.course,
                 self.canvas,
             )
 
-    def get_attachments(self) -> Generator[File, None, None]:
+    def get_attachments(self) -> Generator[FileRecord, None, None]:
         for item in self.items_by_type(ModuleItemType.ATTACHMENT):
             yield self.canvas.get_file(item.content_id)
 
@@ -177,6 +383,31 @@ class ModuleScan(Scanner):
             yield self.canvas.get_quiz(item.content_id)
 
 
+@dataclass
+class FolderScan(Scanner):
+    """
+    Folders in the Files area of a course, their files are listed for the whole
+    course at once by ``CourseScan.get_folder_files``
+    """
+
+    folder: Folder
+    course: CourseScan
+    canvas: Canvas
+
+    @property
+    def name(self) -> str:
+        return "/".join(self.parts)
+
+    @property
+    def id(self) -> int:
+        return self.folder.id
+
+    @property
+    def parts(self) -> list[str]:
+        # INFO: Every full name starts with the root folder, "course files"
+        return self.folder.full_name.split("/")[1:]
+
+
 @dataclass
 class PageScan(Scanner):
     """
@@ -200,23 +431,32 @@ class PageScan(Scanner):
     def empty(self) -> bool:
         # Prevent attribute errors
         if not hasattr(self.page, "body"):
-            logger.debug(f"Page with id {self.id} has no body")
+            logger.debug("Page with id %s has no body", self.id)
             return True
         else:
             return self.page.body is None
 
-    def _scan_body(self, resource: str, getter: Callable) -> Any:
-        if self.empty:
-            return
+    @cached_property
+    @profiling.timed("links")
+    def links(self) -> dict[str, list[int]]:
+        """
+        IDs of the resources linked from the page by resource type, found in a single
+        pass over the body which is dropped afterwards to keep memory down
+        """
+        links: dict[str, dict[int, None]] = {resource: {} for resource in _RESOURCES}
+        if not self.empty:
+            for _, resource, id in self.course.resource_pattern.findall(self.page.body):
+                links[resource][int(id)] = None
+            self.page.body = None
+
+        logger.debug("Scanned %s from Page(%s)", links, self.id)
+        return {resource: list(ids) for resource, ids in links.items()}
 
-        for _, id in re.findall(
-            self.course.resource_regex.format(resource), self.page.body
-        ):
-            logger.info(f"Scanned {resource}({id}) from Page({self.id})")
-            if id is not None:
-                yield getter(id)
+    def _scan_body(self, resource: str, getter: Callable) -> Any:
+        for id in self.links[resource]:
+            yield getter(id)
 
-    def get_files(self) -> Generator[File, None, None]:
+    def get_files(self) -> Generator[FileRecord, None, None]:
         yield from self._scan_body("files", self.canvas.get_file)
 
     def get_quizzes(self) -> Generator[Quiz, None, None]:
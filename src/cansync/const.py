@@ -3,9 +3,12 @@ import os
 import re
 from collections.abc import Callable
 from pathlib import Path
-from typing import Any, Final
+from typing import Any, Final, get_args
 
-from cansync.types import ConfigDict, TuiStyle
+from cansync.filters import valid_filters
+from cansync.retry import valid_retry
+from cansync.transfer import valid_downloads
+from cansync.types import ConfigDict, StorageBackend, SyncMode, TuiStyle
 from cansync.utils import verify_accessible_path
 
 logger = logging.getLogger(__name__)
@@ -27,11 +30,20 @@ XDG_CONFIG_DIR: Final[Path] = Path(os.getenv("XDG_CONFIG_HOME", str(HOME / ".con
 
 CACHE_DIR: Final[Path] = XDG_CACHE_DIR / "cansync"
 LOG_FN: Final[Path] = CACHE_DIR / "cansync.log"
+MANIFEST_PATH: Final[Path] = CACHE_DIR / "manifest.json"
+COURSES_CACHE_PATH: Final[Path] = CACHE_DIR / "courses.json"
+SEARCH_INDEX_PATH: Final[Path] = CACHE_DIR / "search.db"
+
+# INFO: https://canvas.instructure.com/doc/api/courses.html#method.courses.index
+COURSE_ENROLLMENT_STATES: Final[tuple[str, ...]] = ("active", "invited_or_pending")
 
 CONFIG_DIR: Final[Path] = XDG_CONFIG_DIR / "cansync"
 CONFIG_PATH: Final[Path] = CONFIG_DIR / "config.toml"
 
 DEFAULT_DOWNLOAD_DIR: Final[Path] = HOME / "Documents" / "Cansync"
+QUARANTINE_DIR_NAME: Final[str] = ".cansync-orphans"
+PAGES_DIR_NAME: Final[str] = "Pages"
+ARCHIVE_NAME: Final[str] = "cansync.tar"
 
 CONFIG_DEFAULTS: Final[ConfigDict] = {
     "url": "",
@@ -39,6 +51,16 @@ CONFIG_DEFAULTS: Final[ConfigDict] = {
     "storage_path": str(DEFAULT_DOWNLOAD_DIR),
     "course_ids": [],
 }
+# INFO: Optional keys are left out of new config files and fall back to these
+CONFIG_OPTIONAL_DEFAULTS: Final[dict[str, Any]] = {
+    "filters": {},
+    "retry": {},
+    "downloads": {},
+    "sync_mode": "modules",
+    "mirror_pages": False,
+    "search_index": False,
+    "storage_backend": "directory",
+}
 CONFIG_KEY_DEFINITIONS: Final[dict[str, str]] = {
     "url": "Canvas URL",
     "api_key": "API key",
@@ -50,6 +72,13 @@ CONFIG_VALIDATORS: Final[dict[str, Callable]] = {
     "api_key": lambda s: re.match(API_KEY_REGEX, s),
     "storage_path": lambda s: verify_accessible_path(Path(s).expanduser()),
     "course_ids": lambda ls: all(isinstance(i, int) for i in ls) or ls == [],
+    "filters": valid_filters,
+    "retry": valid_retry,
+    "downloads": valid_downloads,
+    "sync_mode": lambda s: s in get_args(SyncMode),
+    "mirror_pages": lambda b: isinstance(b, bool),
+    "search_index": lambda b: isinstance(b, bool),
+    "storage_backend": lambda s: s in get_args(StorageBackend),
 }
 
 TUI_STYLE: Final[TuiStyle] = {
@@ -83,5 +112,9 @@ LOGGING_CONFIG: Final[dict[str, Any]] = {
             "backupCount": 3,
         },
     },
-    "loggers": {"root": {"level": "DEBUG", "handlers": ["stderr", "file"]}},
+    "loggers": {
+        "root": {"level": "INFO", "handlers": ["stderr", "file"]},
+        # INFO: canvasapi logs every request and dumps every response body
+        "canvasapi": {"level": "WARNING"},
+    },
 }
@@ -2,3 +2,9 @@ class InvalidConfigurationError(Exception):
     """
     Config file is populated with invalid values or partially missing
     """
+
+
+class IncompleteDownloadError(Exception):
+    """
+    Downloaded file doesn't match the size Canvas reported for it
+    """
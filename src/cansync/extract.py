@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import io
+import logging
+import zipfile
+from collections.abc import Callable
+from html.parser import HTMLParser
+from pathlib import Path
+from xml.parsers import expat
+
+logger = logging.getLogger(__name__)
+
+# INFO: Enough for any document someone would read, keeps the index small
+MAX_TEXT_LENGTH = 2_000_000
+
+_TEXT_SUFFIXES = frozenset(
+    {".txt", ".md", ".csv", ".tsv", ".json", ".tex", ".py", ".java", ".c", ".cpp"}
+)
+# INFO: Members holding the text of Office Open XML and OpenDocument files
+_OFFICE_MEMBERS = {
+    ".docx": ("word/document.xml",),
+    ".pptx": ("ppt/slides/slide",),
+    ".xlsx": ("xl/sharedStrings.xml",),
+    ".odt": ("content.xml",),
+    ".odp": ("content.xml",),
+    ".ods": ("content.xml",),
+}
+
+
+class _HTMLText(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts: list[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag) -> None:
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data) -> None:
+        if not self._skip:
+            self.parts.append(data)
+
+
+def _plain_text(path: Path) -> str:
+    with open(path, encoding="utf-8", errors="replace") as fp:
+        return fp.read(MAX_TEXT_LENGTH)
+
+
+def html_text(html: str) -> str:
+    """Visible text of an HTML document or fragment, like a page body"""
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    return " ".join(parser.parts)
+
+
+def _html_text(path: Path) -> str:
+    return html_text(_plain_text(path))
+
+
+def _refuse_doctype(*args) -> None:
+    e = "XML with a DTD"
+    raise ValueError(e)
+
+
+def _ignore(*args) -> None:
+    pass
+
+
+def _xml_text(data: bytes) -> str:
+    """
+    Office documents never declare a DTD, so one is refused rather than letting
+    entities from an untrusted download expand
+    """
+    parts: list[str] = []
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartDoctypeDeclHandler = _refuse_doctype
+    # INFO: Buffered text is only split where some other handler runs
+    parser.StartElementHandler = parser.EndElementHandler = _ignore
+    parser.CharacterDataHandler = parts.append
+    parser.ParseFile(io.BytesIO(data))
+    return " ".join(text.strip() for text in parts if text.strip())
+
+
+def _office_text(path: Path) -> str:
+    prefixes = _OFFICE_MEMBERS[path.suffix.lower()]
+    with zipfile.ZipFile(path) as archive:
+        members = sorted(
+            name
+            for name in archive.namelist()
+            if name.endswith(".xml") and name.startswith(prefixes)
+        )
+        return "\n".join(_xml_text(archive.read(name)) for name in members)
+
+
+def _pdf_text(path: Path) -> str:
+    try:
+        from pypdf import PdfReader  # noqa: PLC0415 -- optional dependency
+    except ImportError:
+        logger.debug("pypdf isn't installed, not reading %s", path.name)
+        return ""
+
+    parts, length = [], 0
+    for page in PdfReader(path).pages:
+        text = page.extract_text() or ""
+        parts.append(text)
+        length += len(text)
+        if length >= MAX_TEXT_LENGTH:
+            break
+    return "\n".join(parts)
+
+
+def _extractor(path: Path) -> Callable[[Path], str] | None:
+    suffix = path.suffix.lower()
+    if suffix in _TEXT_SUFFIXES:
+        return _plain_text
+    if suffix in (".html", ".htm"):
+        return _html_text
+    if suffix in _OFFICE_MEMBERS:
+        return _office_text
+    if suffix == ".pdf":
+        return _pdf_text
+    return None
+
+
+def extract_text(path: Path) -> str:
+    """
+    Text of a document for the search index using only pure Python readers, PDFs
+    need the optional pypdf package. Unknown or broken files have no text
+
+    :returns: At most ``MAX_TEXT_LENGTH`` characters
+    """
+    extractor = _extractor(path)
+    if extractor is None:
+        return ""
+
+    try:
+        return extractor(path)[:MAX_TEXT_LENGTH]
+    except Exception as e:
+        # INFO: Broken documents raise all sorts of errors from the readers
+        logger.warning("Couldn't read text from %s (%s)", path.name, e)
+        return ""
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Any
+
+from cansync.errors import InvalidConfigurationError
+from cansync.types import ConfigDict, FileRecord, FilterConfig
+
+logger = logging.getLogger(__name__)
+
+_PATTERN_KEYS = ("include", "exclude", "content_types", "exclude_content_types")
+
+
+def _matches(value: str, patterns: list[str]) -> bool:
+    value = value.lower()
+    return any(fnmatchcase(value, pattern.lower()) for pattern in patterns)
+
+
+def _valid_rule(key: str, value: Any, *, nested: bool) -> bool:
+    if key in _PATTERN_KEYS:
+        return isinstance(value, list) and all(isinstance(p, str) for p in value)
+    if key == "max_size":
+        return isinstance(value, int) and value >= 0
+    if key == "courses" and not nested:
+        return isinstance(value, dict) and all(
+            k.isdigit() and valid_filters(v, nested=True) for k, v in value.items()
+        )
+    return False
+
+
+def valid_filters(filters: Any, *, nested: bool = False) -> bool:
+    """Validates the filters table from the config file"""
+    return isinstance(filters, dict) and all(
+        _valid_rule(key, value, nested=nested) for key, value in filters.items()
+    )
+
+
+@dataclass(frozen=True)
+class FileFilter:
+    """
+    Include/exclude rules checked against file metadata from listings so unwanted
+    files are skipped before any download request is made
+    """
+
+    include: list[str] = field(default_factory=list)
+    exclude: list[str] = field(default_factory=list)
+    content_types: list[str] = field(default_factory=list)
+    exclude_content_types: list[str] = field(default_factory=list)
+    max_size: int | None = None
+
+    @classmethod
+    def from_config(
+        cls, config: ConfigDict, course_id: int | None = None
+    ) -> FileFilter:
+        """
+        Build the filter for a course, keys in the course's override table replace
+        the global ones
+
+        :raises InvalidConfigurationError: The filters table isn't valid
+        """
+        filters: FilterConfig = config.get("filters", {})
+        if not valid_filters(filters):
+            e = "Invalid [filters] table in the config"
+            raise InvalidConfigurationError(e)
+        rules = {k: v for k, v in filters.items() if k != "courses"}
+        if course_id is not None:
+            rules.update(filters.get("courses", {}).get(str(course_id), {}))
+
+        return cls(**rules)  # type: ignore[arg-type]
+
+    def accepts(self, file: FileRecord) -> bool:
+        """Check if a file passes every rule, unknown metadata never excludes a file"""
+        name, content_type, size = file.filename, file.content_type, file.size
+
+        if self.include and not _matches(name, self.include):
+            reason = "not included"
+        elif self.exclude and _matches(name, self.exclude):
+            reason = "excluded by name"
+        elif (
+            content_type
+            and self.content_types
+            and not _matches(content_type, self.content_types)
+        ):
+            reason = f"content type {content_type} not included"
+        elif content_type and _matches(content_type, self.exclude_content_types):
+            reason = f"content type {content_type} excluded"
+        elif size is not None and self.max_size is not None and size > self.max_size:
+            reason = f"size {size} over {self.max_size}"
+        else:
+            return True
+
+        logger.debug("Filtered out %s (%s)", name, reason)
+        return False
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class LocalIndex:
+    """
+    In-memory view of the storage tree built with a single ``os.scandir`` walk, so
+    checking whether a file exists or a directory needs creating is a lookup rather
+    than a round trip to (possibly network mounted) storage. Only changes made
+    through the index are tracked, so it should live for one sync run
+    """
+
+    def __init__(self, root: Path, ignore: tuple[str, ...] = ()):
+        self.root = root
+        self.ignore = ignore
+        self.files: set[str] = set()
+        self.dirs: set[str] = set()
+        self.scan()
+
+    def scan(self) -> None:
+        self.files.clear()
+        self.dirs.clear()
+        if not self.root.is_dir():
+            return
+
+        self.dirs.add(str(self.root))
+        stack = [str(self.root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.ignore:
+                                self.dirs.add(entry.path)
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            self.files.add(entry.path)
+            except OSError as e:
+                logger.warning("Couldn't scan %s (%s)", directory, e)
+
+        logger.debug("Indexed %d files under %s", len(self.files), self.root)
+
+    def is_file(self, path: Path) -> bool:
+        return str(path) in self.files
+
+    def add(self, path: Path) -> None:
+        self.files.add(str(path))
+
+    def discard(self, path: Path) -> None:
+        self.files.discard(str(path))
+
+    def make_dirs(self, directory: Path) -> None:
+        """Create a directory and its parents unless the index already knows it"""
+        if str(directory) in self.dirs:
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        while str(directory) not in self.dirs and directory != directory.parent:
+            self.dirs.add(str(directory))
+            directory = directory.parent
+
+    def discard_dir(self, directory: Path) -> None:
+        self.dirs.discard(str(directory))
@@ -1,10 +1,21 @@
 import logging
+import sys
 from argparse import ArgumentParser, Namespace
+from collections import Counter
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
 
-from cansync import utils
+from cansync import profiling, utils
+from cansync.api import Canvas
 from cansync.const import CACHE_DIR, CONFIG_DIR
+from cansync.errors import InvalidConfigurationError
+from cansync.manifest import Manifest
+from cansync.search import SearchIndex
+from cansync.storage import Storage
 from cansync.tui.settings import SettingsApplication
 from cansync.tui.sync import SyncApplication
+from cansync.verify import Verifier
+from cansync.watch import Watcher
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +25,10 @@ def parse_args() -> Namespace:
     subparsers = parser.add_subparsers(help="List of subcommands")
 
     parser.add_argument(
-        "-l", "--logs", action="store_true", help="Enable debug logs to output"
+        "-l",
+        "--logs",
+        action="store_true",
+        help="Enable logs to output, add -v for debug logs",
     )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="Enable verbose output (more)"
@@ -31,15 +45,127 @@ def parse_args() -> Namespace:
         help="Force download files even when they are present",
     )
     sync_parser.add_argument(
-        "-l", "--logs", action="store_true", help="Enable debug logs to output"
+        "--full",
+        action="store_true",
+        help="Scan every course even when nothing seems to have changed",
+    )
+    sync_parser.add_argument(
+        "--orphans",
+        choices=["report", "quarantine", "delete"],
+        default="report",
+        help="What to do with local files removed from Canvas (default: report)",
+    )
+    sync_parser.add_argument(
+        "-l",
+        "--logs",
+        action="store_true",
+        help="Enable logs to output, add -v for debug logs",
+    )
+    sync_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run and print where the time went when it ends",
+    )
+    sync_parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Log every file and request instead of a summary per run",
     )
     sync_parser.set_defaults(func=sync)
 
+    watch_parser = subparsers.add_parser(
+        "watch", help="Keep running and download new files as they appear"
+    )
+    watch_parser.add_argument(
+        "-i",
+        "--interval",
+        type=float,
+        default=300,
+        help="Seconds between polls (default: 300)",
+    )
+    watch_parser.add_argument(
+        "--full-every",
+        type=int,
+        default=12,
+        help="Rescan courses without new activity every N polls (default: 12)",
+    )
+    watch_parser.add_argument(
+        "--orphans",
+        choices=["report", "quarantine", "delete"],
+        default="report",
+        help="What to do with local files removed from Canvas (default: report)",
+    )
+    watch_parser.add_argument(
+        "-l",
+        "--logs",
+        action="store_true",
+        help="Enable logs to output, add -v for debug logs",
+    )
+    watch_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run and print where the time went when it ends",
+    )
+    watch_parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Log every file and request instead of a summary per run",
+    )
+    watch_parser.set_defaults(func=watch)
+
+    verify_parser = subparsers.add_parser(
+        "verify", help="Check downloaded files and download broken ones again"
+    )
+    verify_parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only report files that don't match, don't download them again",
+    )
+    verify_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Processes used for hashing (default: one per CPU)",
+    )
+    verify_parser.add_argument(
+        "-l",
+        "--logs",
+        action="store_true",
+        help="Enable logs to output, add -v for debug logs",
+    )
+    verify_parser.set_defaults(func=verify)
+
+    search_parser = subparsers.add_parser(
+        "search", help="Search the names and text of synced files and pages"
+    )
+    search_parser.add_argument("query", nargs="+", help="Words to search for")
+    search_parser.add_argument(
+        "-n",
+        "--limit",
+        type=int,
+        default=20,
+        help="Number of results to show (default: 20)",
+    )
+    search_parser.add_argument(
+        "-l",
+        "--logs",
+        action="store_true",
+        help="Enable logs to output, add -v for debug logs",
+    )
+    search_parser.set_defaults(func=search)
+
     settings_parser = subparsers.add_parser(
         "settings", help="Change settings (run this first)"
     )
     settings_parser.add_argument(
-        "-l", "--logs", action="store_true", help="Enable debug logs to output"
+        "-l",
+        "--logs",
+        action="store_true",
+        help="Enable logs to output, add -v for debug logs",
     )
     settings_parser.set_defaults(func=settings)
 
@@ -49,8 +175,81 @@ def parse_args() -> Namespace:
     return parser.parse_args()
 
 
+def output(text: str) -> None:
+    """Write a line of command output to stdout, kept apart from the logs"""
+    sys.stdout.write(f"{text}\n")
+
+
+def profiled(args: Namespace) -> AbstractContextManager:
+    if getattr(args, "profile", False):
+        return profiling.profile(args.func.__name__, CACHE_DIR / "profiles")
+    return nullcontext()
+
+
 def sync(args: Namespace) -> None:
-    SyncApplication().start()
+    with profiled(args):
+        SyncApplication(
+            force=getattr(args, "force", False),
+            full=getattr(args, "full", False),
+            orphan_action=getattr(args, "orphans", "report"),
+        ).start()
+
+
+def watch(args: Namespace) -> None:
+    if not (args.logs or args.verbose):
+        utils.setup_logging()
+
+    try:
+        with profiled(args):
+            Watcher(Canvas(), args.interval, args.full_every, args.orphans).run()
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+
+
+def verify(args: Namespace) -> None:
+    canvas = Canvas()
+    manifest = Manifest(
+        canvas.local_config["storage_path"],
+        storage_backend=canvas.local_config.get("storage_backend", "directory"),
+    )
+    storage = Storage.from_config(canvas.local_config)
+    verifier = Verifier(manifest, storage, args.jobs)
+
+    counts: Counter[str] = Counter()
+    mismatches = []
+    for result in verifier.check():
+        counts[result.status] += 1
+        if result.mismatch:
+            mismatches.append(result)
+            output(f"{result.status}: {result.path}")
+    manifest.save()
+    output(
+        f"{counts['ok']} ok, {counts['unknown']} without a checksum, "
+        f"{len(mismatches)} mismatched"
+    )
+
+    if not mismatches or args.dry_run:
+        return
+    if not canvas.connect():
+        output("Couldn't connect to Canvas to download mismatched files again")
+        return
+    repaired = verifier.repair(canvas, mismatches)
+    manifest.save()
+    output(f"Downloaded {repaired}/{len(mismatches)} mismatched files again")
+
+
+def search(args: Namespace) -> None:
+    root = Path(utils.get_config()["storage_path"]).expanduser()
+    index = SearchIndex()
+    results = index.search(" ".join(args.query), args.limit)
+    index.close()
+
+    if not results:
+        output("No results, set search_index = true in the config and sync first")
+    for path, snippet in results:
+        # INFO: Pages that aren't mirrored are only on Canvas
+        output(path if "://" in path else str(root / path))
+        output(f"    {' '.join(snippet.split())}")
 
 
 def settings(args: Namespace) -> None:
@@ -65,10 +264,13 @@ def main() -> None:
 
     args = parse_args()
 
-    if args.logs:
-        utils.setup_logging()
+    if args.logs or args.verbose:
+        utils.setup_logging(verbose=args.verbose)
 
-    args.func(args)
+    try:
+        args.func(args)
+    except InvalidConfigurationError as e:
+        sys.exit(f"Invalid config: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections.abc import Generator
+from pathlib import Path, PurePosixPath
+from typing import Any
+
+from cansync.const import MANIFEST_PATH
+from cansync.types import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 3
+
+
+class Manifest:
+    """
+    Record of what a previous sync saw on Canvas and where each file was stored, used
+    to skip courses, modules and pages that haven't changed since and to find local
+    files that Canvas no longer exposes. Stored as JSON in the cache directory and
+    tied to the storage path and backend it was made for
+
+    Each file is mapped to exactly one local path, see ``assign_path``
+    """
+
+    def __init__(
+        self,
+        storage_path: str,
+        path: Path | None = None,
+        storage_backend: StorageBackend = "directory",
+    ):
+        self.path = path if path else MANIFEST_PATH
+        self.storage_path = storage_path
+        self.storage_backend = storage_backend
+        self.data: dict[str, Any] = self._load()
+        # INFO: Case-folded so names that only differ in case collide like on SMB
+        self._paths: dict[str, str] = {
+            file["path"].casefold(): id for id, file in self.data["files"].items()
+        }
+
+    def _empty(self) -> dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "storage_path": self.storage_path,
+            "storage_backend": self.storage_backend,
+            "courses": {},
+            "files": {},
+            "denied": {},
+        }
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            with open(self.path) as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return self._empty()
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable manifest %s (%s)", self.path, e)
+            return self._empty()
+
+        if data.get("version") != MANIFEST_VERSION:
+            logger.info("Manifest version changed, starting a new one")
+            return self._empty()
+        if data.get("storage_path") != self.storage_path:
+            logger.info("Storage path changed, starting a new manifest")
+            return self._empty()
+        if data.get("storage_backend", "directory") != self.storage_backend:
+            logger.info("Storage backend changed, starting a new manifest")
+            return self._empty()
+        data.setdefault("denied", {})
+        return data
+
+    def save(self) -> None:
+        """Write the manifest atomically so an interrupted sync can't corrupt it"""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as fp:
+            json.dump(self.data, fp, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def course(self, id: int) -> dict[str, Any]:
+        return self.data["courses"].setdefault(
+            str(id), {"signature": None, "modules": {}, "pages": {}, "files": []}
+        )
+
+    def course_signature(self, id: int) -> str | None:
+        return self.course(id)["signature"]
+
+    def set_course_signature(self, id: int, signature: str) -> None:
+        self.course(id)["signature"] = signature
+
+    def invalidate(
+        self, course_id: int, module_id: int | None = None, page_url: str | None = None
+    ) -> None:
+        """
+        Forget the signature of a course, or one of its modules or pages, so it is
+        scanned again next time
+        """
+        course = self.course(course_id)
+        if module_id is not None:
+            entry = course["modules"].get(str(module_id))
+        elif page_url is not None:
+            entry = course["pages"].get(page_url)
+        else:
+            entry = course
+        if entry is not None:
+            entry["signature"] = None
+
+    def module_signature(self, course_id: int, id: int) -> str | None:
+        module = self.course(course_id)["modules"].get(str(id))
+        return module["signature"] if module else None
+
+    def record_module(
+        self,
+        course_id: int,
+        id: int,
+        signature: str,
+        files: list[int],
+        pages: list[str],
+    ) -> None:
+        """
+        :param files: IDs of the files attached to the module
+        :param pages: URLs of the pages in the module
+        """
+        self.course(course_id)["modules"][str(id)] = {
+            "signature": signature,
+            "files": files,
+            "pages": pages,
+        }
+
+    def record_folder_files(self, course_id: int, files: list[int]) -> None:
+        """
+        :param files: IDs of the files in the course's Files area that were synced
+        """
+        self.course(course_id)["files"] = files
+
+    def page_signature(self, course_id: int, url: str) -> str | None:
+        page = self.course(course_id)["pages"].get(url)
+        return page.get("signature") if page else None
+
+    def page_html(self, course_id: int, url: str) -> str | None:
+        page = self.course(course_id)["pages"].get(url)
+        return page.get("html") if page else None
+
+    def record_page(
+        self,
+        course_id: int,
+        url: str,
+        signature: str | None,
+        files: list[int],
+        html: str | None = None,
+    ) -> None:
+        """
+        :param signature: Changes when the page has to be scanned again
+        :param files: IDs of the files linked from the page body
+        :param html: Where the page was mirrored relative to the storage path
+        """
+        self.course(course_id)["pages"][url] = {
+            "signature": signature,
+            "files": files,
+            "html": html,
+        }
+
+    def file_path(self, id: int) -> str | None:
+        file = self.data["files"].get(str(id))
+        return file["path"] if file else None
+
+    def assign_path(self, id: int, source: str, wanted: str) -> str:
+        """
+        Local path for a file, which stays the same across runs so a file is never
+        stored (and downloaded) twice. A file keeps its path when it is found from
+        another ``source`` than the one it was first stored from and only moves when
+        it is renamed where it was first found. When another file already took the
+        wanted path, the file ID is added to the name
+
+        :param source: Where the file was found, like a module or a page
+        :param wanted: Sanitized path relative to the storage path
+        """
+        key = str(id)
+        file = self.data["files"].get(key)
+        if file is not None and (file["source"] != source or file["name"] == wanted):
+            return file["path"]
+
+        wanted_path = PurePosixPath(wanted)
+        path, number = wanted, 1
+        while self._paths.setdefault(path.casefold(), key) != key:
+            suffix = str(id) if number == 1 else f"{id}-{number}"
+            path = str(wanted_path.with_stem(f"{wanted_path.stem} ({suffix})"))
+            number += 1
+        return path
+
+    def record_file(  # noqa: PLR0913 -- name, source and checksum are keyword-only
+        self,
+        id: int,
+        course_id: int,
+        path: str,
+        size: int | None,
+        *,
+        name: str | None = None,
+        source: str | None = None,
+        checksum: str | None = None,
+    ) -> str | None:
+        """
+        Remember where a file is stored relative to the storage path
+
+        :param name: The path that was wanted for the file before collisions
+        :param source: Where the file was first found
+        :param checksum: SHA-256 taken while the file was downloaded, the recorded
+            one is kept when not given and the file didn't move
+        :returns: The previous path when the file moved, which is now an orphan
+        """
+        previous = self.file_path(id)
+        if checksum is None and previous == path:
+            checksum = self.checksum(id)
+        self.data["files"][str(id)] = {
+            "course": course_id,
+            "path": path,
+            "size": size,
+            "name": name if name is not None else path,
+            "source": source,
+            "checksum": checksum,
+        }
+        self._paths[path.casefold()] = str(id)
+        self.data["denied"].pop(str(id), None)
+        # INFO: Only the case changed, on a case-insensitive share it's the same file
+        if previous is None or previous.casefold() == path.casefold():
+            return None
+        if self._paths.get(previous.casefold()) == str(id):
+            del self._paths[previous.casefold()]
+        if any(file["path"] == previous for file in self.data["files"].values()):
+            return None
+        return previous
+
+    def denied(self, id: int, updated_at: str | None) -> bool:
+        """If downloading this version of the file was refused before"""
+        file = self.data["denied"].get(str(id))
+        return file is not None and file["updated_at"] == updated_at
+
+    def record_denied(self, id: int, course_id: int, updated_at: str | None) -> None:
+        """
+        Remember a file Canvas refused to download, it is only tried again once it
+        is updated
+        """
+        self.data["denied"][str(id)] = {"course": course_id, "updated_at": updated_at}
+
+    def files(self) -> Generator[tuple[int, str, int | None, str | None], None, None]:
+        """Every stored file as its ID, path, size and checksum"""
+        for id, file in self.data["files"].items():
+            yield int(id), file["path"], file["size"], file.get("checksum")
+
+    def course_paths(self, course_id: int) -> list[str]:
+        """Every file and mirrored page stored for a course"""
+        paths = [
+            file["path"]
+            for file in self.data["files"].values()
+            if file["course"] == course_id
+        ]
+        paths.extend(
+            page["html"]
+            for page in self.course(course_id)["pages"].values()
+            if page.get("html")
+        )
+        return paths
+
+    def unmirrored_pages(self, course_id: int) -> list[str]:
+        """URLs of the recorded pages of a course without a mirrored copy"""
+        return [
+            url
+            for url, page in self.course(course_id)["pages"].items()
+            if not page.get("html")
+        ]
+
+    def checksum(self, id: int) -> str | None:
+        file = self.data["files"].get(str(id))
+        return file.get("checksum") if file else None
+
+    def set_checksum(self, id: int, checksum: str | None) -> None:
+        """Checksums are taken while downloading, see ``record_file``"""
+        file = self.data["files"].get(str(id))
+        if file is not None:
+            file["checksum"] = checksum
+
+    def reconcile(self, course_id: int, module_ids: list[int]) -> list[str]:
+        """
+        Forget modules and pages a fully scanned course no longer has along with any
+        file that none of the remaining modules or pages expose, mirrored copies of
+        the forgotten pages are orphans too
+
+        :returns: Paths of the orphaned files relative to the storage path
+        """
+        course = self.course(course_id)
+        module_keys = {str(id) for id in module_ids}
+        course["modules"] = {
+            k: v for k, v in course["modules"].items() if k in module_keys
+        }
+
+        page_urls = {url for m in course["modules"].values() for url in m["pages"]}
+        mirrored = [
+            page["html"]
+            for url, page in course["pages"].items()
+            if url not in page_urls and page.get("html")
+        ]
+        course["pages"] = {k: v for k, v in course["pages"].items() if k in page_urls}
+
+        exposed = {
+            str(id)
+            for entry in (*course["modules"].values(), *course["pages"].values())
+            for id in entry["files"]
+        }
+        exposed.update(str(id) for id in course.get("files", []))
+        self.data["denied"] = {
+            id: file
+            for id, file in self.data["denied"].items()
+            if file["course"] != course_id or id in exposed
+        }
+        orphans = [
+            id
+            for id, file in self.data["files"].items()
+            if file["course"] == course_id and id not in exposed
+        ]
+        paths = {self.data["files"].pop(id)["path"] for id in orphans}
+        paths.update(mirrored)
+        dropped = set(orphans)
+        self._paths = {k: v for k, v in self._paths.items() if v not in dropped}
+        # INFO: Never hand out a path another file is still stored at
+        paths -= {file["path"] for file in self.data["files"].values()}
+        return sorted(paths)
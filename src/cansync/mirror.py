@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import html
+import logging
+import os
+import posixpath
+import re
+from collections.abc import Callable
+from pathlib import Path
+from urllib.parse import quote as quote_url
+
+from cansync import profiling, utils
+from cansync.api import CourseScan
+from cansync.const import PAGES_DIR_NAME
+from cansync.manifest import Manifest
+from cansync.storage import Storage
+from cansync.types import ModuleItemType
+
+logger = logging.getLogger(__name__)
+
+# INFO: Both absolute and root relative links to files and pages of the course
+_LINK_REGEX = (
+    r"""(href|src)=(["'])(?:{url})?/(?:api/v1/)?courses/{id}/(files|pages)/"""
+    r"""([^"'?#/]+)[^"']*\2"""
+)
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def rewrite_links(
+    body: str,
+    url: str,
+    course_id: int,
+    resolve: Callable[[str, str], str | None],
+) -> str:
+    """
+    Point links to Canvas files and pages at their local copies
+
+    :param url: Canvas URL, root relative links that aren't resolved are made
+        absolute with it so they still work from a local copy
+    :param resolve: Called with the resource type and its ID or page url, returns
+        the relative path to link to or None to keep linking to Canvas
+    """
+
+    def replace(match: re.Match[str]) -> str:
+        attribute, quote, resource, key = match.groups()
+        link = resolve(resource, key)
+        if link is None:
+            link = match[0][len(attribute) + 2 : -1]
+            link = url + link if link.startswith("/") else link
+        else:
+            link = quote_url(link)
+        return f"{attribute}={quote}{link}{quote}"
+
+    pattern = _LINK_REGEX.format(url=re.escape(url), id=course_id)
+    return re.sub(pattern, replace, body)
+
+
+class PageMirror:
+    """
+    Keeps a standalone HTML copy of every page in the course modules under the
+    course directory, with links to downloaded files and other mirrored pages
+    pointing at the local copies. Pages are named after their url so links between
+    them work no matter which module they are in
+    """
+
+    def __init__(self, manifest: Manifest, storage: Storage, url: str):
+        self.manifest = manifest
+        self.storage = storage
+        self.url = url
+        self._pages: dict[int, set[str]] = {}
+
+    def page_path(self, course: CourseScan, url: str) -> str:
+        """Where a page is mirrored relative to the storage path"""
+        return "/".join(
+            (
+                utils.local_name(course.name),
+                PAGES_DIR_NAME,
+                utils.sanitize_name(url) + ".html",
+            )
+        )
+
+    def mirrored_pages(self, course: CourseScan) -> set[str]:
+        if course.id not in self._pages:
+            self._pages[course.id] = {
+                item.page_url
+                for module in course.modules
+                for item in module.items_by_type(ModuleItemType.PAGE)
+            }
+        return self._pages[course.id]
+
+    @profiling.timed("mirror")
+    def save(self, course: CourseScan, url: str, title: str, body: str) -> str:
+        """
+        :returns: Path the page was saved to relative to the storage path
+        """
+        path = self.page_path(course, url)
+        directory = posixpath.dirname(path)
+
+        def resolve(resource: str, key: str) -> str | None:
+            if resource == "files":
+                target = self.manifest.file_path(int(key)) if key.isdigit() else None
+            elif key in self.mirrored_pages(course):
+                target = self.page_path(course, key)
+            else:
+                target = None
+            return posixpath.relpath(target, directory) if target else None
+
+        page = _PAGE_TEMPLATE.format(
+            title=html.escape(title),
+            body=rewrite_links(body, self.url, course.id, resolve),
+        )
+
+        def write(file_path: Path) -> None:
+            tmp_path = file_path.with_name(file_path.name + ".part")
+            tmp_path.write_text(page, encoding="utf-8")
+            os.replace(tmp_path, file_path)
+
+        self.storage.store(path, write)
+        logger.debug("Mirrored %s to %s", url, path)
+        return path
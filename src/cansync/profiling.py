@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# INFO: Timer of the run being profiled, a list so no global statement is needed
+_timers: list[PhaseTimer] = []
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class PhaseTimer:
+    """
+    Wall clock and CPU time spent in each phase of a run, nested phases pause the
+    one they are in so every second is counted once. Only meant for the thread that
+    drives the sync
+    """
+
+    def __init__(self):
+        self.wall: defaultdict[str, float] = defaultdict(float)
+        self.cpu: defaultdict[str, float] = defaultdict(float)
+        self.calls: Counter[str] = Counter()
+        self._stack: list[str] = []
+        self._last = (time.perf_counter(), time.thread_time())
+
+    def _mark(self) -> None:
+        now = (time.perf_counter(), time.thread_time())
+        if self._stack:
+            self.wall[self._stack[-1]] += now[0] - self._last[0]
+            self.cpu[self._stack[-1]] += now[1] - self._last[1]
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        self._mark()
+        self._stack.append(name)
+        self.calls[name] += 1
+        try:
+            yield
+        finally:
+            self._mark()
+            self._stack.pop()
+
+    def report(self, total: float) -> str:
+        lines = [f"{'phase':<10} {'wall':>9} {'cpu':>9} {'calls':>7}"]
+        for name, wall in sorted(self.wall.items(), key=lambda x: -x[1]):
+            lines.append(
+                f"{name:<10} {wall:>8.2f}s {self.cpu[name]:>8.2f}s "
+                f"{self.calls[name]:>7}"
+            )
+        other = max(total - sum(self.wall.values()), 0)
+        lines.append(f"{'other':<10} {other:>8.2f}s")
+        lines.append(f"{'total':<10} {total:>8.2f}s")
+        return "\n".join(lines)
+
+
+def top_functions(stats: pstats.Stats, top: int) -> list[str]:
+    """The functions that took the most time themselves, one line each"""
+    rows = sorted(
+        stats.stats.items(),  # type: ignore[attr-defined]
+        key=lambda row: row[1][2],
+        reverse=True,
+    )[:top]
+    lines = [f"{'own':>9} {'total':>9} {'calls':>8}  function"]
+    for (file, line, function), (_, calls, own, total, _) in rows:
+        lines.append(
+            f"{own:>8.2f}s {total:>8.2f}s {calls:>8}  "
+            f"{Path(file).name}:{line}({function})"
+        )
+    return lines
+
+
+def phase(name: str) -> AbstractContextManager[None]:
+    """Time a phase when a run is being profiled, otherwise do nothing"""
+    return _timers[-1].phase(name) if _timers else nullcontext()
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator that times every call as a phase, see ``phase``"""
+
+    def decorator(function: F) -> F:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+@contextmanager
+def profile(
+    name: str, directory: Path, top: int = 15
+) -> Generator[PhaseTimer, None, None]:
+    """
+    Profile everything run inside with cProfile and phase timers, the raw profile
+    (for ``python -m pstats`` or snakeviz) and a text report are written to
+    ``directory`` and a short summary is printed once done. Download threads only
+    show up as time spent waiting in the download phase
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = directory / f"{name}-{time.strftime('%Y%m%dT%H%M%S')}"
+
+    timer = PhaseTimer()
+    _timers.append(timer)
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield timer
+    finally:
+        profiler.disable()
+        _timers.pop()
+        total = time.perf_counter() - started
+
+        profiler.dump_stats(stem.with_suffix(".prof"))
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        phases = timer.report(total)
+        stem.with_suffix(".txt").write_text(f"{phases}\n\n{stream.getvalue()}")
+
+        summary = "\n".join(top_functions(stats, top))
+        sys.stdout.write(
+            f"{phases}\n\n{summary}\n"
+            f"Profile written to {stem.with_suffix('.prof')}\n"
+        )
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, fields
+from http import HTTPStatus
+from typing import Any
+
+import requests
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import Timeout
+
+from cansync.errors import InvalidConfigurationError
+from cansync.types import ConfigDict
+
+logger = logging.getLogger(__name__)
+
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset(
+    {
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+
+
+def valid_retry(retry: Any) -> bool:
+    """Validates the retry table from the config file"""
+    if not isinstance(retry, dict):
+        return False
+
+    names = {f.name for f in fields(RetryPolicy)}
+    return all(
+        key in names and isinstance(value, int | float) and value >= 0
+        for key, value in retry.items()
+    )
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How hard to try before a request is given up on, every value can be overridden
+    in the retry table of the config file
+    """
+
+    attempts: int = 5
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    timeout: float = 30.0
+    budget: int = 200
+    breaker_threshold: int = 8
+    breaker_cooldown: float = 60.0
+
+    @classmethod
+    def from_config(cls, config: ConfigDict) -> RetryPolicy:
+        """:raises InvalidConfigurationError: The retry table isn't valid"""
+        retry = config.get("retry", {})
+        if not valid_retry(retry):
+            e = "Invalid [retry] table in the config"
+            raise InvalidConfigurationError(e)
+        return cls(**retry)
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter so workers don't retry in lockstep"""
+        cap = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, cap)  # noqa: S311 -- jitter, not crypto
+
+
+class CircuitBreaker:
+    """
+    Opens after too many consecutive failures and makes every request wait out the
+    cooldown instead of hammering a host that is clearly down. The first request
+    after the cooldown decides whether it closes again
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+
+        if remaining > 0:
+            logger.warning("Canvas looks down, pausing for %.0f seconds", remaining)
+            time.sleep(remaining)
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.threshold and self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class RetrySession(requests.Session):
+    """
+    Session that retries idempotent requests on timeouts, connection errors and
+    transient server errors with backoff, sets a default timeout and gives up once
+    the run's retry budget is used up
+    """
+
+    def __init__(self, policy: RetryPolicy):
+        super().__init__()
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy.breaker_threshold, policy.breaker_cooldown)
+        self.retries_left = policy.budget
+        self._lock = threading.Lock()
+
+    def reset_budget(self) -> None:
+        with self._lock:
+            self.retries_left = self.policy.budget
+
+    def _take_retry(self) -> bool:
+        with self._lock:
+            if self.retries_left <= 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+    @staticmethod
+    def _retryable(response: requests.Response) -> bool:
+        if response.status_code in RETRY_STATUSES:
+            return True
+        # INFO: Canvas throttles with a 403 rather than a 429
+        return (
+            response.status_code == HTTPStatus.FORBIDDEN
+            and "Rate Limit Exceeded" in response.text
+        )
+
+    def request(self, method, url, *args, **kwargs) -> requests.Response:  # type: ignore[override]
+        kwargs.setdefault("timeout", self.policy.timeout)
+        retry = method.upper() in RETRY_METHODS
+
+        attempt = 0
+        while True:
+            self.breaker.wait()
+            error: Exception | None = None
+            response: requests.Response | None = None
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (RequestsConnectionError, Timeout) as e:
+                error = e
+            else:
+                if not self._retryable(response):
+                    self.breaker.success()
+                    return response
+
+            self.breaker.failure()
+            attempt += 1
+            if not retry or attempt >= self.policy.attempts or not self._take_retry():
+                if error is not None:
+                    raise error
+                return response  # type: ignore[return-value]
+
+            delay = self.policy.delay(attempt - 1)
+            if (
+                response is not None
+                and response.headers.get("Retry-After", "").isdigit()
+            ):
+                delay = max(delay, float(response.headers["Retry-After"]))
+            reason = error if response is None else f"status {response.status_code}"
+            if response is not None:
+                # INFO: Hand the connection back to the pool, streams keep it otherwise
+                response.close()
+            logger.warning(
+                "%s %s failed (%s), retry %d in %.1fs",
+                method,
+                url,
+                reason,
+                attempt,
+                delay,
+            )
+            time.sleep(delay)
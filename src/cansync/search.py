@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path, PurePosixPath
+from typing import NamedTuple
+
+from cansync import profiling
+from cansync.const import SEARCH_INDEX_PATH
+from cansync.extract import extract_text
+from cansync.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    course INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_course ON documents (course);
+CREATE VIRTUAL TABLE IF NOT EXISTS content USING fts5 (
+    name, body, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+class SearchResult(NamedTuple):
+    path: str
+    snippet: str
+
+
+def fts_query(query: str) -> str:
+    """Quote every word so punctuation in a query isn't read as FTS5 syntax"""
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+
+class SearchIndex:
+    """
+    SQLite full-text index over the names and text of everything synced, kept in
+    the cache directory. Files are only read again when their size or modification
+    time changed since they were indexed
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path if path else SEARCH_INDEX_PATH
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    @profiling.timed("index")
+    def update_course(
+        self,
+        storage: Storage,
+        course_id: int,
+        paths: Iterable[str],
+        pages: Iterable[str] = (),
+    ) -> int:
+        """
+        Index new and changed files of a course and forget the ones that are gone
+
+        :param paths: Every file of the course relative to the storage path
+        :param pages: Every page indexed with ``index_page`` that is still around
+        :returns: Number of files (re)indexed
+        """
+        known = {
+            path: (id, size, mtime)
+            for id, path, size, mtime in self.db.execute(
+                "SELECT id, path, size, mtime FROM documents WHERE course = ?",
+                (course_id,),
+            )
+        }
+
+        indexed = 0
+        with self.db:
+            for path in set(paths):
+                stat = storage.stat(path)
+                if stat is None:
+                    continue
+
+                previous = known.pop(path, None)
+                if previous is not None and previous[1:] == stat:
+                    continue
+
+                if previous is None:
+                    id = self.db.execute(
+                        "INSERT INTO documents (path, course, size, mtime) "
+                        "VALUES (?, ?, ?, ?)",
+                        (path, course_id, *stat),
+                    ).lastrowid
+                else:
+                    id = previous[0]
+                    self.db.execute(
+                        "UPDATE documents SET size = ?, mtime = ? WHERE id = ?",
+                        (*stat, id),
+                    )
+                    self.db.execute("DELETE FROM content WHERE rowid = ?", (id,))
+
+                with storage.local_path(path) as file_path:
+                    text = extract_text(file_path)
+                self.db.execute(
+                    "INSERT INTO content (rowid, name, body) VALUES (?, ?, ?)",
+                    (id, PurePosixPath(path).stem, text),
+                )
+                indexed += 1
+
+            for page in pages:
+                known.pop(page, None)
+            for id, *_ in known.values():
+                self.db.execute("DELETE FROM documents WHERE id = ?", (id,))
+                self.db.execute("DELETE FROM content WHERE rowid = ?", (id,))
+
+        logger.debug("Indexed %d files of Course(%s)", indexed, course_id)
+        return indexed
+
+    def index_page(self, course_id: int, path: str, name: str, text: str) -> None:
+        """
+        Index the text of a page that isn't stored as a file, replacing what was
+        indexed for it before
+
+        :param path: Where the page is found, shown in search results
+        """
+        with self.db:
+            row = self.db.execute(
+                "SELECT id FROM documents WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None:
+                id = self.db.execute(
+                    "INSERT INTO documents (path, course, size, mtime) "
+                    "VALUES (?, ?, ?, 0)",
+                    (path, course_id, len(text)),
+                ).lastrowid
+            else:
+                id = row[0]
+                self.db.execute(
+                    "UPDATE documents SET size = ? WHERE id = ?", (len(text), id)
+                )
+                self.db.execute("DELETE FROM content WHERE rowid = ?", (id,))
+            self.db.execute(
+                "INSERT INTO content (rowid, name, body) VALUES (?, ?, ?)",
+                (id, name, text),
+            )
+
+    def search(self, query: str, limit: int = 20) -> list[SearchResult]:
+        """Best matches first, names and text are both searched"""
+        if not query.strip():
+            return []
+        rows = self.db.execute(
+            "SELECT documents.path, snippet(content, 1, '[', ']', '...', 12) "
+            "FROM content JOIN documents ON documents.id = content.rowid "
+            "WHERE content MATCH ? ORDER BY rank LIMIT ?",
+            (fts_query(query), limit),
+        )
+        return [SearchResult(path, snippet) for path, snippet in rows]
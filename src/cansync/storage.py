@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+from cansync import utils
+from cansync.const import ARCHIVE_NAME, QUARANTINE_DIR_NAME
+from cansync.fsindex import LocalIndex
+from cansync.types import ConfigDict
+
+logger = logging.getLogger(__name__)
+
+Writer = Callable[[Path], None]
+
+_BLOCK_SIZE = tarfile.BLOCKSIZE
+_COPY_SIZE = 1024**2
+
+
+class Storage(ABC):
+    """
+    Where synced files end up, every path is relative to the storage path and uses
+    forward slashes like the paths in the manifest
+    """
+
+    root: Path
+
+    @staticmethod
+    def from_config(config: ConfigDict, *, indexed: bool = False) -> Storage:
+        """
+        :param indexed: Walk the storage directory once up front so existence checks
+            don't touch the disk, worth it when many files are checked
+        """
+        root = Path(config["storage_path"]).expanduser()
+        if config.get("storage_backend", "directory") == "archive":
+            return ArchiveStorage(root)
+        index = LocalIndex(root, ignore=(QUARANTINE_DIR_NAME,)) if indexed else None
+        return DirectoryStorage(root, index)
+
+    @abstractmethod
+    def exists(self, path: str) -> bool: ...
+
+    @abstractmethod
+    def stat(self, path: str) -> tuple[int, int] | None:
+        """:returns: Size and modification time in nanoseconds"""
+
+    @abstractmethod
+    def store(self, path: str, write: Writer) -> None:
+        """
+        :param write: Called with a local file path to write the contents to, it may
+            raise to leave the storage untouched
+        """
+
+    @abstractmethod
+    def remove(self, path: str) -> None: ...
+
+    @abstractmethod
+    def move(self, path: str, destination: str) -> None: ...
+
+    @abstractmethod
+    def locate(self, path: str) -> tuple[Path, int, int]:
+        """:returns: Local file holding the contents, their offset and size"""
+
+    def read(self, path: str, start: int = 0, length: int | None = None) -> bytes:
+        """Read part of a file without reading the rest"""
+        file, offset, size = self.locate(path)
+        length = size - start if length is None else min(length, size - start)
+        with open(file, "rb") as fp:
+            return os.pread(fp.fileno(), max(length, 0), offset + start)
+
+    @contextmanager
+    def local_path(self, path: str) -> Generator[Path, None, None]:
+        """A local file with the contents, for readers that need a real file"""
+        yield self.root / path
+
+    @abstractmethod
+    def save(self) -> None:
+        """Persist anything kept in memory, called once a course is synced"""
+
+
+class DirectoryStorage(Storage):
+    """
+    Files laid out in nested course/module/page directories under the storage path,
+    existence checks and directory creation go through the index when given
+    """
+
+    def __init__(self, root: Path, index: LocalIndex | None = None):
+        self.root = root
+        self.index = index
+
+    def exists(self, path: str) -> bool:
+        file = self.root / path
+        return self.index.is_file(file) if self.index else file.is_file()
+
+    def stat(self, path: str) -> tuple[int, int] | None:
+        try:
+            stat = (self.root / path).stat()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _make_dirs(self, directory: Path) -> None:
+        if self.index is not None:
+            self.index.make_dirs(directory)
+        else:
+            utils.create_dir(directory)
+
+    def _removed(self, file: Path) -> None:
+        if self.index is not None:
+            self.index.discard(file)
+        for directory in utils.remove_empty_dirs(file.parent, self.root):
+            if self.index is not None:
+                self.index.discard_dir(directory)
+
+    def store(self, path: str, write: Writer) -> None:
+        file = self.root / path
+        self._make_dirs(file.parent)
+        write(file)
+        if self.index is not None:
+            self.index.add(file)
+
+    def remove(self, path: str) -> None:
+        file = self.root / path
+        file.unlink(missing_ok=True)
+        self._removed(file)
+
+    def move(self, path: str, destination: str) -> None:
+        file, moved = self.root / path, self.root / destination
+        self._make_dirs(moved.parent)
+        os.replace(file, moved)
+        if self.index is not None:
+            self.index.add(moved)
+        self._removed(file)
+
+    def locate(self, path: str) -> tuple[Path, int, int]:
+        file = self.root / path
+        return file, 0, file.stat().st_size
+
+    def save(self) -> None:
+        """Every change is written to the disk right away"""
+
+
+class ArchiveStorage(Storage):
+    """
+    Every file appended to a single tar archive in the storage path, with a JSON
+    sidecar index of where each member's data starts so files can be checked and
+    read without scanning the archive. Appends overwrite the end-of-archive marker
+    and only the index decides what is in the archive, so data appended before an
+    interrupted run saved its index is simply written over. Removed or replaced
+    files keep taking up space, when extracting with tar the last copy wins
+    """
+
+    def __init__(self, root: Path, name: str | None = None):
+        self.root = root
+        self.path = root / (name if name else ARCHIVE_NAME)
+        self.index_path = self.path.with_name(self.path.name + ".index.json")
+        self.end = 0
+        # INFO: Path mapped to data offset, size and modification time
+        self.members: dict[str, list[int]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path) as fp:
+                data = json.load(fp)
+            self.end, self.members = data["end"], data["members"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable archive index %s (%s)", self.path, e)
+
+    def save(self) -> None:
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as fp:
+            json.dump(
+                {"end": self.end, "members": self.members}, fp, separators=(",", ":")
+            )
+        os.replace(tmp_path, self.index_path)
+
+    def exists(self, path: str) -> bool:
+        return path in self.members
+
+    def stat(self, path: str) -> tuple[int, int] | None:
+        member = self.members.get(path)
+        return (member[1], member[2]) if member else None
+
+    def _append(self, path: str, source: BinaryIO, size: int) -> None:
+        info = tarfile.TarInfo(path)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        header = info.tobuf(format=tarfile.PAX_FORMAT)
+
+        utils.create_dir(self.root)
+        with open(self.path, "r+b" if self.path.exists() else "w+b") as fp:
+            fp.seek(self.end)
+            fp.write(header)
+            offset = fp.tell()
+            remaining = size
+            while remaining:
+                chunk = source.read(min(remaining, _COPY_SIZE))
+                if not chunk:
+                    e = f"{path} ended {remaining} bytes early"
+                    raise OSError(e)
+                fp.write(chunk)
+                remaining -= len(chunk)
+            fp.write(tarfile.NUL * (-size % _BLOCK_SIZE))
+            end = fp.tell()
+            fp.write(tarfile.NUL * 2 * _BLOCK_SIZE)
+            fp.truncate()
+
+        self.members[path] = [offset, size, time.time_ns()]
+        self.end = end
+
+    def store(self, path: str, write: Writer) -> None:
+        utils.create_dir(self.root)
+        fd, tmp_name = tempfile.mkstemp(prefix=".cansync-", dir=self.root)
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            write(tmp_path)
+            with open(tmp_path, "rb") as source:
+                self._append(path, source, os.fstat(source.fileno()).st_size)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def remove(self, path: str) -> None:
+        self.members.pop(path, None)
+
+    def move(self, path: str, destination: str) -> None:
+        _, offset, size = self.locate(path)
+        with open(self.path, "rb") as source:
+            source.seek(offset)
+            self._append(destination, source, size)
+        self.remove(path)
+
+    def locate(self, path: str) -> tuple[Path, int, int]:
+        offset, size, _ = self.members[path]
+        return self.path, offset, size
+
+    @contextmanager
+    def local_path(self, path: str) -> Generator[Path, None, None]:
+        _, offset, size = self.locate(path)
+        with tempfile.TemporaryDirectory(prefix=".cansync-", dir=self.root) as tmp:
+            # INFO: Keep the name, readers look at the suffix
+            tmp_path = Path(tmp) / Path(path).name
+            with open(self.path, "rb") as source, open(tmp_path, "wb") as target:
+                source.seek(offset)
+                remaining = size
+                while remaining:
+                    chunk = source.read(min(remaining, _COPY_SIZE))
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    remaining -= len(chunk)
+            yield tmp_path
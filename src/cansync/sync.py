@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from collections import Counter
+from collections.abc import Callable
+from functools import cached_property, partial
+from pathlib import Path
+
+from canvasapi.exceptions import CanvasException
+from requests.exceptions import RequestException
+
+from cansync import profiling, utils
+from cansync.api import Canvas, CourseScan, ModuleScan, PageScan, Scanner
+from cansync.const import QUARANTINE_DIR_NAME
+from cansync.extract import html_text
+from cansync.filters import FileFilter
+from cansync.manifest import Manifest
+from cansync.mirror import PageMirror
+from cansync.search import SearchIndex
+from cansync.storage import Storage
+from cansync.types import FileRecord, ModuleItemType, OrphanAction, SyncMode
+
+logger = logging.getLogger(__name__)
+
+ActionCallback = Callable[[CourseScan, Scanner, str], None]
+
+
+class Synchronizer:
+    """
+    Walks the configured courses and downloads everything that passes the filters,
+    shared by the TUI and the headless commands which only differ in how they report
+    progress through ``on_action``
+
+    Files are found through modules and the pages in them, through the course's
+    Files area or both depending on ``mode``, the sync_mode config key by default.
+    Pages are mirrored as local HTML when mirror_pages is set in the config and
+    everything stored, along with the text of pages, is added to the search index
+    when search_index is set.
+    Files are kept in the storage_backend the config picks.
+    Courses, modules and pages whose change signals match the manifest are skipped
+    unless ``full`` (or ``force``) is set. Anything where a download failed isn't
+    recorded as synced so it is scanned again next time. Once a course is scanned
+    without failures, files the manifest stored for it that Canvas no longer exposes
+    are handled according to ``orphan_action``
+    """
+
+    def __init__(  # noqa: PLR0913 -- everything but canvas is a keyword-only option
+        self,
+        canvas: Canvas,
+        *,
+        force: bool = False,
+        full: bool = False,
+        on_action: ActionCallback | None = None,
+        manifest: Manifest | None = None,
+        orphan_action: OrphanAction = "report",
+        mode: SyncMode | None = None,
+    ):
+        self.canvas = canvas
+        self.mode: SyncMode = (
+            mode if mode else canvas.local_config.get("sync_mode", "modules")
+        )
+        self.force = force
+        self.full = full or force
+        self.on_action = on_action
+        self.manifest = (
+            manifest
+            if manifest
+            else Manifest(
+                canvas.local_config["storage_path"],
+                storage_backend=canvas.local_config.get("storage_backend", "directory"),
+            )
+        )
+        self.root = Path(canvas.local_config["storage_path"]).expanduser()
+        self.mirror_pages: bool = canvas.local_config.get("mirror_pages", False)
+        self.search_index: bool = canvas.local_config.get("search_index", False)
+        self.orphan_action = orphan_action
+        self.orphans: list[Path] = []
+        self.download_count = 0
+        self.stats: Counter[str] = Counter()
+        self.seen: set[int] = set()
+        self.failed: set[int] = set()
+        # INFO: Failed downloads and listings so far, to tell what to rescan
+        self.failures = 0
+
+    @cached_property
+    def storage(self) -> Storage:
+        """Built on first use so runs where nothing changed never walk the storage"""
+        return Storage.from_config(self.canvas.local_config, indexed=True)
+
+    @cached_property
+    def mirror(self) -> PageMirror:
+        return PageMirror(self.manifest, self.storage, self.canvas.local_config["url"])
+
+    @cached_property
+    def search(self) -> SearchIndex:
+        return SearchIndex()
+
+    @profiling.timed("ui")
+    def action(self, course: CourseScan, scanner: Scanner, action: str) -> None:
+        if self.on_action is not None:
+            self.on_action(course, scanner, action)
+
+    def summary(self) -> str:
+        """One line describing everything done so far, logged instead of every file"""
+        return (
+            f"{self.download_count} downloaded, {self.stats['present']} present, "
+            f"{self.stats['filtered']} filtered, {self.stats['failed']} failed, "
+            f"{self.stats['denied']} denied, "
+            f"{len(self.orphans)} removed from Canvas, "
+            f"{self.stats['courses_skipped']} unchanged courses skipped"
+        )
+
+    def sync(self) -> int:
+        """
+        Sync every course in the config
+
+        :returns: Number of new files downloaded
+        """
+        new = sum(self.sync_course(course) for course in self.canvas.get_courses())
+        logger.info("Sync finished: %s", self.summary())
+        return new
+
+    def course_signature(self, course: CourseScan, file_filter: FileFilter) -> str:
+        """Digest of everything that decides what syncing the course would do"""
+        signals = [course.signature()] if self.mode != "files" else []
+        if self.mode != "modules":
+            signals.append(course.folders_signature())
+        if self.mirror_pages:
+            signals.append("mirror_pages")
+        if self.search_index:
+            # INFO: Turning the index on has to index courses that didn't change
+            signals.append("search_index")
+        # INFO: Changing the filters has to rescan courses for newly included files
+        return utils.digest(*signals, file_filter)
+
+    @profiling.timed("scan")
+    def sync_course(self, course: CourseScan) -> int:
+        """
+        Sync a single course, the manifest is saved once the course is finished so an
+        interrupted course is scanned again next time
+
+        :returns: Number of new files downloaded
+        """
+        before, failures = self.download_count, self.failures
+        file_filter = FileFilter.from_config(self.canvas.local_config, course.id)
+        signature = self.course_signature(course, file_filter)
+
+        if not self.full and self.manifest.course_signature(course.id) == signature:
+            logger.debug("%s hasn't changed, skipping", course.name)
+            self.stats["courses_skipped"] += 1
+            return 0
+
+        if self.mode != "files":
+            self.sync_modules(course, file_filter)
+        if self.mode != "modules":
+            self.sync_folders(course, file_filter)
+        else:
+            self.manifest.record_folder_files(course.id, [])
+
+        if self.failures == failures:
+            module_ids = [m.id for m in course.modules] if self.mode != "files" else []
+            orphans = self.manifest.reconcile(course.id, module_ids)
+            self.handle_orphans(orphans)
+            self.manifest.set_course_signature(course.id, signature)
+        else:
+            self.manifest.invalidate(course.id)
+            # INFO: What wasn't recorded would look removed from Canvas
+            logger.info(
+                "Some files of %s failed, it is scanned again next time", course.name
+            )
+
+        if "storage" in self.__dict__:
+            # INFO: Before the manifest so it never records files storage lost
+            self.storage.save()
+        self.manifest.save()
+
+        if self.search_index:
+            try:
+                self.search.update_course(
+                    self.storage,
+                    course.id,
+                    self.manifest.course_paths(course.id),
+                    [
+                        self.page_document(course, url)
+                        for url in self.manifest.unmirrored_pages(course.id)
+                    ],
+                )
+            except sqlite3.Error as e:
+                logger.warning("Couldn't update the search index (%s)", e)
+        return self.download_count - before
+
+    def sync_modules(self, course: CourseScan, file_filter: FileFilter) -> None:
+        for module in course.get_modules():
+            signals = [module.signature(), file_filter]
+            if self.mirror_pages:
+                signals.append("mirror_pages")
+            if self.search_index:
+                signals.append("search_index")
+            module_signature = utils.digest(*signals)
+            if (
+                not self.full
+                and self.manifest.module_signature(course.id, module.id)
+                == module_signature
+            ):
+                logger.debug("Module(%s) hasn't changed, skipping", module.id)
+                continue
+
+            failures = self.failures
+            files = self.sync_module(course, module, file_filter)
+            if self.failures != failures:
+                self.manifest.invalidate(course.id, module_id=module.id)
+                continue
+            self.manifest.record_module(
+                course.id,
+                module.id,
+                module_signature,
+                files,
+                [item.page_url for item in module.items_by_type(ModuleItemType.PAGE)],
+            )
+
+    def page_signature(
+        self, course: CourseScan, url: str, file_filter: FileFilter
+    ) -> str | None:
+        """Changes when the page is updated or the filters change, None if unknown"""
+        updated_at = course.page_updates.get(url)
+        if not updated_at:
+            return None
+        # INFO: Turning the index on has to read the text of unchanged pages
+        if self.search_index:
+            return utils.digest(updated_at, file_filter, "search_index")
+        return utils.digest(updated_at, file_filter)
+
+    def page_document(self, course: CourseScan, url: str) -> str:
+        """Where a page that isn't mirrored is found, for the search index"""
+        return f"{self.canvas.local_config['url']}/courses/{course.id}/pages/{url}"
+
+    def page_unchanged(
+        self, course: CourseScan, file_filter: FileFilter, url: str
+    ) -> bool:
+        signature = self.page_signature(course, url, file_filter)
+        return (
+            not self.full
+            and signature is not None
+            and self.manifest.page_signature(course.id, url) == signature
+            and (
+                not self.mirror_pages
+                or self.manifest.page_html(course.id, url) is not None
+            )
+        )
+
+    def sync_module(
+        self, course: CourseScan, module: ModuleScan, file_filter: FileFilter
+    ) -> list[int]:
+        """
+        :returns: IDs of the files attached to the module, filtered out or not
+        """
+        attachments = []
+        for attachment in module.get_attachments():
+            attachments.append(attachment.id)
+            if not file_filter.accepts(attachment):
+                self.stats["filtered"] += 1
+                continue
+            self.action(course, module, "Downloading attachments...")
+            self.download(attachment, None, course, module)
+
+        skip = partial(self.page_unchanged, course, file_filter)
+        for page in module.get_pages(skip=skip):
+            failures = self.failures
+            self.action(course, module, "Reading page...")
+            # INFO: Scanning for links drops the body, keep it for the mirror and index
+            keep = self.mirror_pages or self.search_index
+            body = page.page.body if keep and not page.empty else None
+
+            files = []
+            for file in page.get_files():
+                files.append(file.id)
+                if not file_filter.accepts(file):
+                    self.stats["filtered"] += 1
+                    continue
+                self.action(course, module, f"Downloading file [{file.filename}]...")
+                self.download(file, page, course, module)
+
+            url = page.page.url
+            if self.failures != failures:
+                self.manifest.invalidate(course.id, page_url=url)
+                continue
+            html = None
+            if self.mirror_pages and body is not None:
+                try:
+                    html = self.mirror.save(course, url, page.name, body)
+                except OSError as e:
+                    logger.warning("Couldn't mirror %s (%s)", page.name, e)
+            if self.search_index and body is not None and html is None:
+                self.index_page(course, url, page.name, body)
+            self.manifest.record_page(
+                course.id,
+                url,
+                self.page_signature(course, url, file_filter),
+                files,
+                html,
+            )
+
+        return attachments
+
+    def index_page(self, course: CourseScan, url: str, name: str, body: str) -> None:
+        """Mirrored pages are indexed with the other files, the rest from their body"""
+        try:
+            self.search.index_page(
+                course.id, self.page_document(course, url), name, html_text(body)
+            )
+        except sqlite3.Error as e:
+            logger.warning("Couldn't index %s (%s)", name, e)
+
+    def sync_folders(self, course: CourseScan, file_filter: FileFilter) -> None:
+        """
+        Sync the course's Files area, files stored through a module first stay
+        where they are
+        """
+        if not course.folders:
+            # INFO: Keep the recorded files so a hidden Files area doesn't orphan them
+            logger.warning("%s has no Files area available", course.name)
+            return
+
+        files = []
+        try:
+            for folder, file in course.get_folder_files():
+                files.append(file.id)
+                if not file_filter.accepts(file):
+                    self.stats["filtered"] += 1
+                    continue
+                self.action(course, folder, f"Downloading file [{file.filename}]...")
+                self.store(
+                    file,
+                    course,
+                    folder,
+                    [course.name, *folder.parts],
+                    f"folder/{folder.id}",
+                )
+        except (CanvasException, RequestException) as e:
+            # INFO: Files missing from a partial listing aren't removed from Canvas
+            logger.warning("Can't list files of %s (%s)", course.name, e)
+            self.failures += 1
+            return
+        self.manifest.record_folder_files(course.id, files)
+
+    def handle_orphans(self, paths: list[str]) -> None:
+        """Report, quarantine or delete local files Canvas no longer exposes"""
+        for path in paths:
+            file_path = self.root / path
+            if not self.storage.exists(path):
+                continue
+
+            self.orphans.append(file_path)
+            if self.orphan_action == "report":
+                logger.warning("%s was removed from Canvas", file_path)
+                continue
+
+            if self.orphan_action == "quarantine":
+                destination = f"{QUARANTINE_DIR_NAME}/{path}"
+                self.storage.move(path, destination)
+                logger.warning(
+                    "Moved %s removed from Canvas to %s", file_path, destination
+                )
+            else:
+                self.storage.remove(path)
+                logger.warning("Deleted %s removed from Canvas", file_path)
+
+    def download(
+        self,
+        file: FileRecord,
+        page: PageScan | None,
+        course: CourseScan,
+        module: ModuleScan,
+    ) -> bool:
+        names = (course.name, module.name, page.name if page is not None else None)
+        source = f"{module.id}/{page.page.url}" if page is not None else str(module.id)
+        return self.store(
+            file, course, module, [n for n in names if n is not None], source
+        )
+
+    def store(
+        self,
+        file: FileRecord,
+        course: CourseScan,
+        scanner: Scanner,
+        names: list[str],
+        source: str,
+    ) -> bool:
+        """
+        :param scanner: Module or folder the file was found in, for progress
+        :param names: Directory names the file should be stored under
+        :param source: Where the file was found, see ``Manifest.assign_path``
+        """
+        if file.id in self.seen:
+            # INFO: Linked from more than one place, it is only stored once
+            self.failures += file.id in self.failed
+            return False
+        self.seen.add(file.id)
+        if not self.force and self.manifest.denied(file.id, file.updated_at):
+            logger.debug("%s was denied before, skipping", file.filename)
+            self.stats["denied"] += 1
+            return False
+
+        wanted = "/".join(
+            (
+                *(utils.local_name(name) for name in names),
+                utils.sanitize_name(file.filename),
+            )
+        )
+        path = self.manifest.assign_path(file.id, source, wanted)
+        *dirs, name = path.split("/")
+
+        result = utils.download_structured(
+            file,
+            *dirs,
+            name=name,
+            force=self.force,
+            storage=self.storage,
+            downloader=self.canvas.downloader,
+        )
+        status = result.status
+        new = status == "downloaded"
+        present = self.storage.exists(path)
+        if new:
+            self.download_count += 1
+        elif status == "denied":
+            # INFO: Not a failure, retrying every run would never let the course
+            # be skipped or reconciled
+            self.stats["denied"] += 1
+            self.manifest.record_denied(file.id, course.id, file.updated_at)
+        else:
+            self.action(course, scanner, "Skipping file...")
+            self.stats["present" if present else "failed"] += 1
+        if not present and status != "denied":
+            self.failed.add(file.id)
+            self.failures += 1
+
+        if present:
+            moved = self.manifest.record_file(
+                file.id,
+                course.id,
+                path,
+                file.size,
+                name=wanted,
+                source=source,
+                checksum=result.checksum,
+            )
+            if moved is not None:
+                self.handle_orphans([moved])
+        return new
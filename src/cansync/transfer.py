@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http import HTTPStatus
+from itertools import pairwise
+from pathlib import Path
+from typing import Any, NamedTuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.exceptions import RequestException
+
+from cansync.errors import IncompleteDownloadError, InvalidConfigurationError
+from cansync.types import ConfigDict
+
+logger = logging.getLogger(__name__)
+
+_CONTENT_RANGE_REGEX = r"bytes \d+-\d+/(\d+)"
+
+
+_TIME_REGEX = r"([01]\d|2[0-3]):([0-5]\d)"
+_MIN_READ_SIZE = 16 * 1024
+# INFO: Requests per segment before a download is given up on
+_SEGMENT_TRIES = 3
+
+
+def _minutes(clock: str) -> int:
+    match = re.fullmatch(_TIME_REGEX, clock)
+    if match is None:
+        e = f"Invalid time '{clock}', expected HH:MM"
+        raise ValueError(e)
+    return int(match[1]) * 60 + int(match[2])
+
+
+def valid_window(window: Any) -> bool:
+    return (
+        isinstance(window, dict)
+        and window.keys() == {"start", "end", "rate_limit"}
+        and all(
+            isinstance(window[k], str) and re.fullmatch(_TIME_REGEX, window[k])
+            for k in ("start", "end")
+        )
+        and isinstance(window["rate_limit"], int)
+        and window["rate_limit"] >= 0
+    )
+
+
+def valid_downloads(downloads: Any) -> bool:
+    """Validates the downloads table from the config file"""
+    if not isinstance(downloads, dict):
+        return False
+
+    for key, value in downloads.items():
+        if key == "schedule":
+            if not isinstance(value, list) or not all(map(valid_window, value)):
+                return False
+        elif key == "rate_limit":
+            if not isinstance(value, int) or value < 0:
+                return False
+        elif key in ("segment_threshold", "segments", "chunk_size"):
+            if not isinstance(value, int) or value <= 0:
+                return False
+        else:
+            return False
+
+    return True
+
+
+class RateWindow(NamedTuple):
+    """Time of day (in minutes) during which a different rate limit applies"""
+
+    start: int
+    end: int
+    rate_limit: int
+
+    def contains(self, minute: int) -> bool:
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        # INFO: Window goes past midnight
+        return minute >= self.start or minute < self.end
+
+
+@dataclass(frozen=True)
+class DownloadOptions:
+    """
+    Files at least ``segment_threshold`` bytes big are fetched as ``segments`` byte
+    ranges in parallel and all downloads share ``rate_limit`` bytes per second (0 is
+    unlimited) unless a window in ``schedule`` says otherwise, every value can be
+    overridden in the downloads table of the config file
+    """
+
+    segment_threshold: int = 64 * 1024**2
+    segments: int = 4
+    chunk_size: int = 1024**2
+    rate_limit: int = 0
+    schedule: tuple[RateWindow, ...] = ()
+
+    @classmethod
+    def from_config(cls, config: ConfigDict) -> DownloadOptions:
+        """:raises InvalidConfigurationError: The downloads table isn't valid"""
+        if not valid_downloads(config.get("downloads", {})):
+            e = "Invalid [downloads] table in the config"
+            raise InvalidConfigurationError(e)
+        downloads = dict(config.get("downloads", {}))
+        schedule = tuple(
+            RateWindow(_minutes(w["start"]), _minutes(w["end"]), w["rate_limit"])
+            for w in downloads.pop("schedule", [])
+        )
+        return cls(**downloads, schedule=schedule)  # type: ignore[arg-type]
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every download thread so the total rate stays under the
+    limit no matter how many files or segments are in flight. The bucket only holds
+    a fraction of a second worth of bytes, which keeps bursts short, and a thread
+    that takes more than is left waits for the debt to refill
+    """
+
+    def __init__(self, rate_limit: int, schedule: tuple[RateWindow, ...] = ()):
+        self.rate_limit = rate_limit
+        self.schedule = schedule
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def rate(self) -> int:
+        """Bytes per second allowed right now, 0 is unlimited"""
+        if self.schedule:
+            now = time.localtime()
+            minute = now.tm_hour * 60 + now.tm_min
+            for window in self.schedule:
+                if window.contains(minute):
+                    return window.rate_limit
+        return self.rate_limit
+
+    def read_size(self, chunk_size: int) -> int:
+        """Smaller reads while limited so waits are spread out evenly"""
+        rate = self.rate()
+        return min(chunk_size, max(rate // 8, _MIN_READ_SIZE)) if rate else chunk_size
+
+    def consume(self, amount: int) -> None:
+        rate = self.rate()
+        if not rate:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            capacity = rate / 4
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / rate if self.tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+class Downloader:
+    """
+    Streams files to disk through the shared session instead of buffering them in
+    memory, writing to a temporary file that only replaces the target once its size
+    has been verified. The SHA-256 of what was written is taken along the way
+    """
+
+    def __init__(
+        self, session: requests.Session, api_key: str, options: DownloadOptions
+    ):
+        self.session = session
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.options = options
+        self.limiter = RateLimiter(options.rate_limit, options.schedule)
+
+    def download(self, url: str, path: Path, size: int | None = None) -> str:
+        """
+        :param size: Size Canvas reported for the file, used to decide on a
+            segmented download and to verify the result
+        :raises IncompleteDownloadError: When the file on disk has the wrong size
+        :returns: SHA-256 of the file's contents
+        """
+        part_path = path.with_name(path.name + ".part")
+        try:
+            if (
+                size is not None
+                and size >= self.options.segment_threshold
+                and self.options.segments > 1
+                and hasattr(os, "pwrite")
+            ):
+                checksum = self._download_segmented(url, part_path, size)
+            else:
+                checksum = self._download_stream(url, part_path)
+
+            written = part_path.stat().st_size
+            if size is not None and written != size:
+                e = f"{path.name} is {written} bytes but should be {size}"
+                raise IncompleteDownloadError(e)
+            os.replace(part_path, path)
+            return checksum
+        finally:
+            part_path.unlink(missing_ok=True)
+
+    def _download_stream(
+        self, url: str, path: Path, response: requests.Response | None = None
+    ) -> str:
+        if response is None:
+            response = self.session.get(url, headers=self.headers, stream=True)
+        digest = hashlib.sha256()
+        with response, open(path, "wb") as fp:
+            response.raise_for_status()
+            read_size = self.limiter.read_size(self.options.chunk_size)
+            for chunk in response.iter_content(read_size):
+                self.limiter.consume(len(chunk))
+                fp.write(chunk)
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _hash_file(self, path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as fp:
+            while chunk := fp.read(self.options.chunk_size):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _download_segmented(self, url: str, path: Path, size: int) -> str:
+        # INFO: Probing also follows the redirect to the file's signed storage URL
+        probe = self.session.get(
+            url, headers={**self.headers, "Range": "bytes=0-0"}, stream=True
+        )
+        if probe.status_code != HTTPStatus.PARTIAL_CONTENT:
+            logger.debug("Byte ranges unsupported for %s, streaming instead", path.name)
+            return self._download_stream(url, path, probe)
+
+        probe.close()
+        match = re.fullmatch(
+            _CONTENT_RANGE_REGEX, probe.headers.get("Content-Range", "")
+        )
+        if match is None or int(match[1]) != size:
+            logger.debug(
+                "Unexpected range response for %s, streaming instead", path.name
+            )
+            return self._download_stream(url, path)
+
+        final_url = probe.url
+        # INFO: Signed storage URLs reject requests that also carry our token
+        same_host = urlsplit(final_url).netloc == urlsplit(url).netloc
+        headers = self.headers if same_host else {}
+        segments = self.options.segments
+        bounds = [size * i // segments for i in range(segments + 1)]
+        logger.debug("Downloading %s in %d segments", path.name, segments)
+
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            with ThreadPoolExecutor(segments) as pool:
+                futures = [
+                    pool.submit(self._fetch_range, final_url, headers, fd, start, end)
+                    for start, end in pairwise(bounds)
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            os.close(fd)
+        # INFO: Segments land out of order, read back while still in the page cache
+        return self._hash_file(path)
+
+    def _fetch_range(
+        self,
+        url: str,
+        headers: dict[str, str],
+        fd: int,
+        start: int,
+        end: int,
+    ) -> None:
+        """Write bytes [start, end) of the file into place, resuming if cut off"""
+        offset = start
+        for attempt in range(_SEGMENT_TRIES):
+            if offset >= end:
+                return
+            try:
+                with self.session.get(
+                    url,
+                    headers={**headers, "Range": f"bytes={offset}-{end - 1}"},
+                    stream=True,
+                ) as response:
+                    if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+                        e = f"Expected partial content, got {response.status_code}"
+                        raise IncompleteDownloadError(e)
+                    read_size = self.limiter.read_size(self.options.chunk_size)
+                    for chunk in response.iter_content(read_size):
+                        self.limiter.consume(len(chunk))
+                        data = chunk[: end - offset]
+                        os.pwrite(fd, data, offset)
+                        offset += len(data)
+            except RequestException as e:
+                logger.warning(
+                    "Segment %d-%d cut off at %d (%s)", start, end, offset, e
+                )
+                if attempt == _SEGMENT_TRIES - 1:
+                    raise
+
+        if offset != end:
+            e = f"Segment {start}-{end} stopped at {offset}"
+            raise IncompleteDownloadError(e)
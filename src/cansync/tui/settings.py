@@ -1,14 +1,25 @@
 import logging
 import sys
+import threading
 from collections.abc import Callable
 from typing import Any
 
 from cansync import utils
 from cansync.api import Canvas
 from cansync.const import TUI_STYLE
-from cansync.tui.shared import ErrorWindow
+from cansync.tui.shared import CourseList, ErrorWindow
 from cansync.types import ConfigKeys
-from pytermgui import Button, Container, InputField, Splitter, Window, WindowManager
+from canvasapi.exceptions import CanvasException
+from pytermgui import (
+    Button,
+    Container,
+    InputField,
+    Label,
+    Splitter,
+    Window,
+    WindowManager,
+)
+from requests.exceptions import RequestException
 
 logger = logging.getLogger(__name__)
 _SELECT_OPTIONS = utils.same_length(
@@ -100,7 +111,7 @@ class ConfigEditWindow(Window):
 
     def _overwrite_value(self, text: str, key: ConfigKeys) -> None:
         if not utils.valid_key(key, text):
-            logger.info(f"Invalid replacements for config, {key}: {text}")
+            logger.info("Invalid replacements for config, %s: %s", key, text)
             self.context.add(ErrorWindow(self.context, "Invalid value entered."))
         else:
             utils.overwrite_config_value(key, text)
@@ -143,67 +154,56 @@ class StorageInputWindow(ConfigEditWindow):
 
 class CoursesWindow(Window):
     """
-    Show a list of courses as checkboxes and append select courses' ids to the config
-    file
+    Show a searchable list of courses and write the enabled courses' ids to the
+    config file. Courses are drawn from the cache straight away and refreshed from
+    Canvas in the background
     """
 
     def __init__(self, context: WindowManager, canvas: Canvas):
         self.context = context
         self.canvas = canvas
-        self.course_id: dict[str, int] = {}
-        self.enabled = Container()
-        self.disabled = Container()
+        self.config = utils.get_config()
+        self.status = Label("")
+        courses = utils.get_course_cache(self.config["url"])
+        self.course_list = CourseList(
+            courses if courses is not None else [], self.config["course_ids"]
+        )
         self.submit = Container(Button("Submit", onclick=self.on_submit, centered=True))
 
         super().__init__(
-            "[bold]Disabled",
-            "",
-            self.disabled,
-            "[bold]Enabled",
-            "",
-            self.enabled,
+            self.status,
+            self.course_list,
+            "[dim]Type to search, Enter toggles, Ctrl-A/D all",
             self.submit,
             **TUI_STYLE,
         )
 
-        self.center()
-
-        config = utils.get_config()
+        if courses is None:
+            self.status.value = "[italic]Loading courses..."
 
-        for name, id in self.canvas.get_courses_info():
-            max_length = TUI_STYLE["width"] - 14
-            shortened_name = utils.short_name(name, max_length)
-
-            self.course_id[shortened_name] = id
-            course_button = Button(shortened_name, onclick=self.on_button_click)
-            if id in config["course_ids"]:
-                self.enabled += course_button
-            else:
-                self.disabled += course_button
-            self.height += 1
-
-    def on_button_click(self, button: Button) -> None:
-        def swap_container(button: Button, con1: Container, con2: Container) -> None:
-            """
-            Swap button from con1 -> con2 AND retain selection position
-            """
-            idx = con1._widgets.index(button)
-
-            con1.remove(button)
-            con2 += button
+        self.center()
+        self.select(0)
+        threading.Thread(target=self.refresh, daemon=True).start()
 
-            if idx > 0:
-                con1.select(idx)
+    def refresh(self) -> None:
+        try:
+            courses = list(self.canvas.get_courses_info())
+        except (CanvasException, RequestException) as e:
+            logger.warning("Couldn't refresh courses (%s)", e)
+            self.status.value = "[italic]Couldn't refresh courses"
+            return
 
-        if button in self.disabled:
-            swap_container(button, self.disabled, self.enabled)
-        elif button in self.enabled:
-            swap_container(button, self.enabled, self.disabled)
+        utils.set_course_cache(self.config["url"], courses)
+        self.course_list.set_courses(courses)
+        self.status.value = ""
 
     def on_submit(self, _: Button) -> None:
+        # INFO: Courses missing from the listing (e.g. finished ones) stay enabled
+        enabled = self.course_list.enabled
         utils.overwrite_config_value(
             "course_ids",
-            [self.course_id[b.label] for b in self.enabled],
+            [id for id in self.config["course_ids"] if id in enabled]
+            + sorted(enabled.difference(self.config["course_ids"])),
         )
         self.exit()
 
@@ -1,6 +1,13 @@
-from collections.abc import Callable
+from __future__ import annotations
 
-from pytermgui import Button, Window, WindowManager
+import threading
+from collections.abc import Callable, Iterable
+
+from pytermgui import Button, MouseEvent, Widget, Window, WindowManager, keys, tim
+from pytermgui.markup import escape
+
+from cansync import utils
+from cansync.types import CourseInfo
 
 
 class ErrorWindow(Window):
@@ -21,3 +28,156 @@ class ErrorWindow(Window):
 
     def back(self, _: Button) -> None:
         self.context.remove(self)
+
+
+class CourseList(Widget):
+    """
+    Course picker that only draws the rows in view so long enrollment lists stay
+    quick to draw and navigate. Typing filters the courses by name, Enter toggles
+    the highlighted course and Ctrl-A/Ctrl-D enable or disable every match
+    """
+
+    def __init__(
+        self,
+        courses: list[CourseInfo],
+        enabled: Iterable[int],
+        rows: int = 15,
+        **attrs,
+    ):
+        super().__init__(**attrs)
+        self.rows = rows
+        self.height = rows + 2  # INFO: Search line and status line
+        self._selectables_length = 1
+
+        self.query = ""
+        self.cursor = 0
+        self.offset = 0
+        self.enabled: set[int] = set(enabled)
+        self._pending: list[CourseInfo] | None = None
+        self._lock = threading.Lock()
+        self.set_courses(courses)
+        self._apply_courses()
+
+    def set_courses(self, courses: list[CourseInfo]) -> None:
+        """
+        Replace the listed courses, enabled courses stay enabled. Safe to call from
+        another thread, the courses are swapped in by the UI thread on the next draw
+        """
+        with self._lock:
+            self._pending = courses
+
+    def _apply_courses(self) -> None:
+        with self._lock:
+            courses, self._pending = self._pending, None
+        if courses is None:
+            return
+
+        self.courses = courses
+        self._names = [name.lower() for name, _ in courses]
+        self.matches = self._search(range(len(courses)))
+        self._scroll_to(self.cursor)
+
+    def _search(self, candidates: Iterable[int]) -> list[int]:
+        query = self.query.lower()
+        return [i for i in candidates if query in self._names[i]]
+
+    def search(self, query: str) -> None:
+        """
+        Filter courses by name, a longer query only searches through the previous
+        matches
+        """
+        candidates = self.matches if query.startswith(self.query) else None
+        self.query = query
+        self.matches = self._search(
+            candidates if candidates is not None else range(len(self.courses))
+        )
+        self._scroll_to(0)
+
+    def _scroll_to(self, cursor: int) -> None:
+        """Move the cursor and keep it within the rows in view"""
+        self.cursor = max(min(cursor, len(self.matches) - 1), 0)
+        if self.cursor < self.offset:
+            self.offset = self.cursor
+        elif self.cursor >= self.offset + self.rows:
+            self.offset = self.cursor - self.rows + 1
+
+    def toggle(self, row: int | None = None) -> None:
+        """Toggle the course under the cursor, or in the given row of the view"""
+        index = self.cursor if row is None else self.offset + row
+        if not 0 <= index < len(self.matches):
+            return
+
+        _, id = self.courses[self.matches[index]]
+        self.enabled ^= {id}
+        self.cursor = index
+
+    def set_all(self, *, enabled: bool) -> None:
+        """Enable or disable every course that matches the search"""
+        ids = {self.courses[i].id for i in self.matches}
+        if enabled:
+            self.enabled |= ids
+        else:
+            self.enabled -= ids
+
+    def get_lines(self) -> list[str]:
+        self._apply_courses()
+        focused = self.selected_index is not None
+        lines = [f"Search: {self.query}" + ("_" if focused else "")]
+
+        name_length = max(self.width - 4, 1)
+        for index in range(self.offset, self.offset + self.rows):
+            if index >= len(self.matches):
+                lines.append("")
+                continue
+
+            name, id = self.courses[self.matches[index]]
+            box = "■" if id in self.enabled else "□"
+            lines.append(f"{box} {utils.short_name(name, name_length)}")
+
+        lines.append(
+            f"{len(self.matches)}/{len(self.courses)} shown, "
+            f"{len(self.enabled)} enabled"
+        )
+
+        lines = [escape(line[: self.width].ljust(self.width)) for line in lines]
+        if focused and self.matches:
+            row = self.cursor - self.offset + 1
+            lines[row] = "[inverse]" + lines[row]
+        return [tim.parse(line) for line in lines]
+
+    def handle_key(self, key: str) -> bool:
+        if key == keys.UP:
+            if self.cursor == 0:
+                return False
+            self._scroll_to(self.cursor - 1)
+        elif key == keys.DOWN:
+            if self.cursor >= len(self.matches) - 1:
+                return False
+            self._scroll_to(self.cursor + 1)
+        elif key in (keys.ENTER, keys.RETURN):
+            self.toggle()
+        elif key == keys.CTRL_A:
+            self.set_all(enabled=True)
+        elif key == keys.CTRL_D:
+            self.set_all(enabled=False)
+        elif key == keys.BACKSPACE:
+            self.search(self.query[:-1])
+        elif len(key) == 1 and key.isprintable():
+            self.search(self.query + key)
+        else:
+            return False
+        return True
+
+    def on_left_click(self, event: MouseEvent) -> bool:
+        row = event.position[1] - self.pos[1] - 1
+        if 0 <= row < self.rows:
+            self.toggle(row)
+        return True
+
+    def on_scroll_up(self, _: MouseEvent) -> bool:
+        self._scroll_to(self.cursor - 1)
+        return True
+
+    def on_scroll_down(self, _: MouseEvent) -> bool:
+        self._scroll_to(self.cursor + 1)
+        return True
@@ -1,14 +1,32 @@
 from enum import StrEnum
-from typing import Literal, NamedTuple, TypedDict
+from typing import Literal, NamedTuple, NotRequired, TypedDict
 
 from canvasapi.course import Course as Course
 from canvasapi.file import File as File
+from canvasapi.folder import Folder as Folder
 from canvasapi.module import Module as Module
 from canvasapi.module import ModuleItem as ModuleItem
 from canvasapi.page import Page as Page
 from canvasapi.quiz import Quiz as Quiz
 
-ConfigKeys = Literal["url", "api_key", "course_ids", "storage_path"]
+OrphanAction = Literal["report", "quarantine", "delete"]
+SyncMode = Literal["modules", "files", "both"]
+StorageBackend = Literal["directory", "archive"]
+DownloadStatus = Literal["downloaded", "present", "denied", "failed"]
+VerifyStatus = Literal["ok", "unknown", "missing", "size", "checksum", "unreadable"]
+ConfigKeys = Literal[
+    "url",
+    "api_key",
+    "course_ids",
+    "storage_path",
+    "filters",
+    "retry",
+    "downloads",
+    "sync_mode",
+    "mirror_pages",
+    "search_index",
+    "storage_backend",
+]
 
 
 class ModuleItemType(StrEnum):
@@ -23,11 +41,51 @@ class ModuleItemType(StrEnum):
     ASSIGNMENT = "Assignment"
 
 
+class FilterConfig(TypedDict, total=False):
+    include: list[str]
+    exclude: list[str]
+    content_types: list[str]
+    exclude_content_types: list[str]
+    max_size: int
+    courses: dict[str, "FilterConfig"]
+
+
+class RetryConfig(TypedDict, total=False):
+    attempts: int
+    backoff: float
+    max_backoff: float
+    timeout: float
+    budget: int
+    breaker_threshold: int
+    breaker_cooldown: float
+
+
+class RateWindowConfig(TypedDict):
+    start: str
+    end: str
+    rate_limit: int
+
+
+class DownloadsConfig(TypedDict, total=False):
+    segment_threshold: int
+    segments: int
+    chunk_size: int
+    rate_limit: int
+    schedule: list[RateWindowConfig]
+
+
 class ConfigDict(TypedDict):
     url: str
     api_key: str
     course_ids: list[int]
     storage_path: str
+    filters: NotRequired[FilterConfig]
+    retry: NotRequired[RetryConfig]
+    downloads: NotRequired[DownloadsConfig]
+    sync_mode: NotRequired[SyncMode]
+    mirror_pages: NotRequired[bool]
+    search_index: NotRequired[bool]
+    storage_backend: NotRequired[StorageBackend]
 
 
 class CourseInfo(NamedTuple):
@@ -35,6 +93,57 @@ class CourseInfo(NamedTuple):
     id: int
 
 
+class FileRecord(NamedTuple):
+    """
+    The parts of a canvasapi File needed to filter and download it, so the full
+    attribute dict and requester aren't kept alive for every file seen
+    """
+
+    id: int
+    filename: str
+    size: int | None
+    updated_at: str | None
+    url: str
+    content_type: str | None
+
+    @classmethod
+    def from_file(cls, file: File) -> "FileRecord":
+        return cls(
+            file.id,
+            file.filename,
+            getattr(file, "size", None),
+            getattr(file, "updated_at", None),
+            file.url,
+            getattr(file, "content-type", None),
+        )
+
+
+class DownloadResult(NamedTuple):
+    status: DownloadStatus
+    # INFO: SHA-256 of the contents, only taken when the file was downloaded
+    checksum: str | None = None
+
+
+class ModuleItemRecord(NamedTuple):
+    """The parts of a canvasapi ModuleItem needed to find its content"""
+
+    id: int
+    type: str
+    title: str
+    content_id: int | None
+    page_url: str | None
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "ModuleItemRecord":
+        return cls(
+            item["id"],
+            item["type"],
+            item.get("title", ""),
+            item.get("content_id"),
+            item.get("page_url"),
+        )
+
+
 class TuiStyle(TypedDict):
     box: str
     width: int
@@ -1,17 +1,48 @@
+import atexit
+import hashlib
+import json
 import logging.config
+import logging.handlers
 import os
+import queue
 import re
-from functools import reduce
+from http import HTTPStatus
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import toml
-from canvasapi.exceptions import ResourceDoesNotExist
-
-from cansync.errors import InvalidConfigurationError
-from cansync.types import ConfigDict, ConfigKeys, File
+from requests.exceptions import HTTPError, RequestException
+
+from cansync import profiling
+from cansync.errors import IncompleteDownloadError, InvalidConfigurationError
+from cansync.transfer import Downloader
+from cansync.types import (
+    ConfigDict,
+    ConfigKeys,
+    CourseInfo,
+    DownloadResult,
+    FileRecord,
+)
+
+if TYPE_CHECKING:
+    from cansync.storage import Storage
 
 logger = logging.getLogger(__name__)
 
+_ILLEGAL_CHARS_REGEX = r'[\x00-\x1f<>:"/\\|?*]'
+_RESERVED_NAMES = frozenset(
+    {"CON", "PRN", "AUX", "NUL"}
+    | {f"{device}{i}" for device in ("COM", "LPT") for i in range(1, 10)}
+)
+# INFO: Leaves room below the usual 255 byte limit for collision suffixes
+_MAX_NAME_BYTES = 224
+# INFO: Anything longer is not really an extension, like a sentence after a dot
+_MAX_SUFFIX_BYTES = 16
+# INFO: Locked, unpublished or deleted files, asking again won't help
+_DENIED_STATUSES = frozenset(
+    {HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN, HTTPStatus.NOT_FOUND}
+)
+
 
 def verify_accessible_path(p: Path) -> bool:
     """
@@ -25,24 +56,82 @@ def verify_accessible_path(p: Path) -> bool:
         p.mkdir(parents=True)
         return True
     except PermissionError as e:
-        logger.warn(e)
+        logger.warning(e)
         return False
     except Exception as e:
-        logger.warn(f"Unknown path resolution error: '{e}'")
+        logger.warning("Unknown path resolution error: '%s'", e)
         return False
 
 
-def setup_logging() -> None:
-    """Setup logging using logging config defined in const.py"""
+def setup_logging(*, verbose: bool = False) -> None:
+    """
+    Setup logging using logging config defined in const.py, the configured handlers
+    are moved behind a queue so only a background thread writes to the log file and
+    download workers never wait on it. The logging thread still merges the message
+    arguments before queueing a record
+
+    :param verbose: Log every file and request at debug level instead of per run
+        summaries
+    """
     from cansync.const import LOGGING_CONFIG
 
+    for handler in logging.getLogger().handlers:
+        listener = getattr(handler, "listener", None)
+        if isinstance(listener, logging.handlers.QueueListener):
+            atexit.unregister(listener.stop)
+            listener.stop()
+
     logging.config.dictConfig(LOGGING_CONFIG)
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    if verbose:
+        root.setLevel(logging.DEBUG)
+        logging.getLogger("canvasapi").setLevel(logging.INFO)
+        for handler in handlers:
+            handler.setLevel(min(handler.level, logging.INFO))
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # INFO: Where the next call finds the listener to stop, as on Python 3.12+
+    queue_handler.listener = logging.handlers.QueueListener(  # type: ignore[attr-defined]
+        log_queue, *handlers, respect_handler_level=True
+    )
+    root.addHandler(queue_handler)
+    queue_handler.listener.start()  # type: ignore[attr-defined]
+    atexit.register(queue_handler.listener.stop)  # type: ignore[attr-defined]
 
 
 def path_format(name: str) -> str:
     return name.replace(" ", "-")
 
 
+def local_name(name: str) -> str:
+    """Directory name for a course, module, page or folder"""
+    return path_format(sanitize_name(name))
+
+
+def sanitize_name(name: str) -> str:
+    """
+    Make a Canvas name usable as a single path component on any filesystem, SMB
+    shares included, by replacing separators and reserved characters and keeping
+    the extension when it has to be shortened
+    """
+    name = re.sub(_ILLEGAL_CHARS_REGEX, "_", name).strip().rstrip(". ")
+    if not name:
+        return "_"
+    if name.split(".")[0].upper() in _RESERVED_NAMES:
+        name = "_" + name
+
+    if len(name.encode()) > _MAX_NAME_BYTES:
+        stem, suffix = os.path.splitext(name)
+        suffix = suffix if len(suffix.encode()) <= _MAX_SUFFIX_BYTES else ""
+        limit = _MAX_NAME_BYTES - len(suffix.encode())
+        name = stem.encode()[:limit].decode(errors="ignore").rstrip(". ") + suffix
+    return name
+
+
 def short_name(name: str, max_length: int) -> str:
     """Convert a long name to a short version for pretty UI"""
     if len(name) <= max_length:
@@ -66,9 +155,15 @@ def better_course_name(name: str) -> str:
     return re.sub(r" \((\d,? ?)+\)", "", name)
 
 
+def digest(*parts: Any) -> str:
+    """Short stable hash of some JSON-serializable values, used for change detection"""
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode(), usedforsecurity=False).hexdigest()
+
+
 def create_dir(directory: Path) -> None:
     """Create a new directory if it does not already exist"""
-    logger.debug(f"Creating directory {directory} if not existing")
+    logger.debug("Creating directory %s if not existing", directory)
     os.makedirs(directory, exist_ok=True)
 
 
@@ -79,7 +174,7 @@ def create_config(config_path: Path | None = None) -> None:
     config_path = config_path if config_path else CONFIG_PATH
 
     if not config_path.exists():
-        logger.debug(f"Creating new config file at {config_path}")
+        logger.debug("Creating new config file at %s", config_path)
         create_dir(config_path.parent)
         set_config(CONFIG_DEFAULTS, config_path)
 
@@ -89,16 +184,17 @@ def complete(config: ConfigDict) -> bool:
     Check if all fields are present in the config, if not then it's
     probably broken
     """
-    from cansync.const import CONFIG_KEY_DEFINITIONS
+    from cansync.const import CONFIG_KEY_DEFINITIONS, CONFIG_OPTIONAL_DEFAULTS
 
-    return CONFIG_KEY_DEFINITIONS.keys() == config.keys()
+    required = CONFIG_KEY_DEFINITIONS.keys()
+    return required <= config.keys() <= required | CONFIG_OPTIONAL_DEFAULTS.keys()
 
 
-def valid_key(key: ConfigKeys, value: str | list[int]) -> bool:
+def valid_key(key: ConfigKeys, value: Any) -> bool:
     """Validates config key and value against test conditions"""
-    from cansync.const import CONFIG_KEY_DEFINITIONS, CONFIG_VALIDATORS
+    from cansync.const import CONFIG_VALIDATORS
 
-    if key not in CONFIG_KEY_DEFINITIONS:
+    if key not in CONFIG_VALIDATORS:
         e = f"Key '{key}' not in config definition"
         raise KeyError(e)
     return CONFIG_VALIDATORS[key](value)
@@ -109,6 +205,7 @@ def valid(config: ConfigDict) -> bool:
     return all(valid_key(k, v) for k, v in config.items()) and complete(config)  # type: ignore[arg-type]
 
 
+@profiling.timed("config")
 def get_config(path: Path | None = None) -> ConfigDict:
     """
     Get config options from config file
@@ -137,11 +234,11 @@ def set_config(config: ConfigDict, dest: Path | None = None) -> None:
         toml.dump(config, fp)
 
 
-def overwrite_config_value(key: ConfigKeys, value: str | list[int]) -> None:
+def overwrite_config_value(key: ConfigKeys, value: Any) -> None:
     """Overwrite a specific value in the config file"""
-    from cansync.const import CONFIG_DEFAULTS
+    from cansync.const import CONFIG_DEFAULTS, CONFIG_OPTIONAL_DEFAULTS
 
-    if key not in CONFIG_DEFAULTS:
+    if key not in CONFIG_DEFAULTS and key not in CONFIG_OPTIONAL_DEFAULTS:
         e = f"Overwrite with non-existent key '{key}'"
         raise InvalidConfigurationError(e)
 
@@ -150,29 +247,107 @@ def overwrite_config_value(key: ConfigKeys, value: str | list[int]) -> None:
     set_config(config)
 
 
-def download_structured(file: File, *dirs: str, force=False, tui=False) -> bool:
+def get_course_cache(url: str, path: Path | None = None) -> list[CourseInfo] | None:
     """
-    Download a canvasapi File and preserve course structure using directory names
+    Get the course listing saved by the last refresh for this Canvas URL
 
-    :returns: If the file was downloaded
+    :returns: Cached courses or None when there is no usable cache
     """
-    download_dir = Path(get_config()["storage_path"]).expanduser()
+    from cansync.const import COURSES_CACHE_PATH
+
+    path = path if path else COURSES_CACHE_PATH
+    try:
+        with open(path) as fp:
+            cache = json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+    if cache.get("url") != url:
+        return None
+    return [CourseInfo(name, id) for name, id in cache["courses"]]
 
-    # this is my favourite line of code (that mypy hates :D)
-    path: Path = reduce(lambda p, q: p / q, [download_dir, *dirs])  # type: ignore[operator, assignment]
-    file_path = path / file.filename
-    create_dir(path)
 
-    if not file_path.is_file() or force:
-        logger.info(f"Downloading {file.filename}" + "" if not force else " (forced)")
+def set_course_cache(
+    url: str, courses: list[CourseInfo], path: Path | None = None
+) -> None:
+    """Save the course listing for this Canvas URL"""
+    from cansync.const import COURSES_CACHE_PATH
+
+    path = path if path else COURSES_CACHE_PATH
+    with open(path, "w") as fp:
+        logger.debug("Caching %d courses", len(courses))
+        json.dump({"url": url, "courses": courses}, fp)
+
+
+def storage_root() -> Path:
+    return Path(get_config()["storage_path"]).expanduser()
+
+
+def remove_empty_dirs(path: Path, root: Path) -> list[Path]:
+    """
+    Remove path and its parents while they are empty, stopping at root
+
+    :returns: Directories that were removed
+    """
+    removed = []
+    while path != root and root in path.parents:
         try:
-            file.download(file_path)
-            return True
-        except ResourceDoesNotExist as e:
+            path.rmdir()
+        except OSError:
+            break
+        removed.append(path)
+        path = path.parent
+    return removed
+
+
+@profiling.timed("download")
+def download_structured(
+    file: FileRecord,
+    *dirs: str,
+    downloader: Downloader,
+    force=False,
+    storage: "Storage | None" = None,
+    name: str | None = None,
+) -> DownloadResult:
+    """
+    Download a Canvas file and preserve course structure using directory names
+
+    :param storage: Where the file goes, plain directories under the storage path
+        when not given
+    :param name: Store the file under this name instead of its Canvas filename
+    :returns: If the file was downloaded, already present, can't be accessed or
+        failed in a way that may work next time, with the checksum of a download
+    """
+    if storage is None:
+        from cansync.storage import DirectoryStorage
+
+        storage = DirectoryStorage(storage_root())
+
+    path = "/".join((*dirs, name or file.filename))
+    if not storage.exists(path) or force:
+        logger.debug("Downloading %s%s", file.filename, " (forced)" if force else "")
+        checksum = None
+
+        def write(file_path: Path) -> None:
+            nonlocal checksum
+            checksum = downloader.download(file.url, file_path, file.size)
+
+        try:
+            storage.store(path, write)
+            return DownloadResult("downloaded", checksum)
+        except HTTPError as e:
+            if e.response is None or e.response.status_code not in _DENIED_STATUSES:
+                logger.warning("Failed to download %s (%s)", file.filename, e)
+                return DownloadResult("failed")
             logger.warning(
-                f"Tried to download {file.filename} but we likely don't have access ({e})"
+                "Tried to download %s but we likely don't have access (%s)",
+                file.filename,
+                e,
             )
-            return False
+            return DownloadResult("denied")
+        except (RequestException, IncompleteDownloadError) as e:
+            logger.warning("Failed to download %s (%s)", file.filename, e)
+            return DownloadResult("failed")
     else:
-        logger.info(f"{file.filename} already present, skipping")
-        return False
+        logger.debug("%s already present, skipping", file.filename)
+        return DownloadResult("present")
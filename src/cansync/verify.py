@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+from collections.abc import Generator
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import NamedTuple
+
+from canvasapi.exceptions import CanvasException
+
+from cansync import utils
+from cansync.api import Canvas
+from cansync.manifest import Manifest
+from cansync.storage import Storage
+from cansync.types import VerifyStatus
+
+logger = logging.getLogger(__name__)
+
+MISMATCHES: frozenset[VerifyStatus] = frozenset(
+    {"missing", "size", "checksum", "unreadable"}
+)
+
+
+def hash_file(path: str, offset: int = 0, size: int | None = None) -> str:
+    """
+    SHA-256 of a file read through a memory map, so the kernel pages it in without
+    copying it through Python buffers. Runs in the worker processes
+
+    :param offset: Where the contents start, for files kept inside an archive
+    :param size: Length of the contents, the rest of the file by default
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                end = len(mapped) if size is None else offset + size
+                with memoryview(mapped) as view, view[offset:end] as contents:
+                    digest.update(contents)
+    return digest.hexdigest()
+
+
+class VerifyResult(NamedTuple):
+    id: int
+    path: Path
+    status: VerifyStatus
+    checksum: str | None = None
+
+    @property
+    def mismatch(self) -> bool:
+        return self.status in MISMATCHES
+
+
+class Verifier:
+    """
+    Checks the files the manifest knows about against their recorded size and
+    checksum without touching the network. Sizes are compared first, only files
+    with the right size are hashed in a process pool and results are yielded as
+    they finish. Checksums are taken when files are downloaded, files stored before
+    that have none and are only checked by size
+    """
+
+    def __init__(
+        self, manifest: Manifest, storage: Storage, workers: int | None = None
+    ):
+        self.manifest = manifest
+        self.storage = storage
+        self.root = storage.root
+        self.workers = workers
+
+    def check(self) -> Generator[VerifyResult, None, None]:
+        with ProcessPoolExecutor(self.workers) as pool:
+            futures: dict[Future[str], tuple[int, Path, str]] = {}
+            for id, path, size, checksum in self.manifest.files():
+                file_path = self.root / path
+                stat = self.storage.stat(path)
+                if stat is None:
+                    yield VerifyResult(id, file_path, "missing")
+                    continue
+
+                if size is not None and stat[0] != size:
+                    yield VerifyResult(id, file_path, "size")
+                    continue
+                if checksum is None:
+                    yield VerifyResult(id, file_path, "unknown")
+                    continue
+                try:
+                    file, offset, length = self.storage.locate(path)
+                except OSError as e:
+                    logger.warning("Couldn't read %s (%s)", file_path, e)
+                    yield VerifyResult(id, file_path, "unreadable")
+                    continue
+                future = pool.submit(hash_file, str(file), offset, length)
+                futures[future] = (id, file_path, checksum)
+
+            for future in as_completed(futures):
+                id, file_path, checksum = futures.pop(future)
+                try:
+                    actual = future.result()
+                except OSError as e:
+                    logger.warning("Couldn't read %s (%s)", file_path, e)
+                    yield VerifyResult(id, file_path, "unreadable")
+                    continue
+
+                if checksum != actual:
+                    yield VerifyResult(id, file_path, "checksum", actual)
+                else:
+                    yield VerifyResult(id, file_path, "ok", actual)
+
+    def repair(self, canvas: Canvas, results: list[VerifyResult]) -> int:
+        """
+        Download mismatched files again into the path they were stored at
+
+        :returns: Number of files that were downloaded
+        """
+        repaired = 0
+        for result in results:
+            *dirs, name = result.path.relative_to(self.root).parts
+            try:
+                file = canvas.get_file(result.id)
+            except CanvasException as e:
+                logger.warning("Can't download %s again (%s)", result.path, e)
+                continue
+            download = utils.download_structured(
+                file,
+                *dirs,
+                name=name,
+                force=True,
+                downloader=canvas.downloader,
+                storage=self.storage,
+            )
+            if download.status == "downloaded":
+                self.manifest.set_checksum(result.id, download.checksum)
+                repaired += 1
+        self.storage.save()
+        return repaired
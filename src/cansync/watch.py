@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+
+from canvasapi.exceptions import CanvasException
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import RequestException
+
+from cansync.api import Canvas
+from cansync.errors import InvalidConfigurationError
+from cansync.sync import Synchronizer
+from cansync.types import OrphanAction
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """
+    Long running sync that keeps one connected Canvas instance (and so its connection
+    pool and file metadata) between polls. Courses with new activity are synced on
+    every poll, the rest only on every ``full_every`` poll since file uploads don't
+    always show up in the activity stream
+    """
+
+    def __init__(
+        self,
+        canvas: Canvas,
+        interval: float,
+        full_every: int,
+        orphan_action: OrphanAction = "report",
+    ):
+        self.canvas = canvas
+        self.orphan_action = orphan_action
+        self.interval = interval
+        self.full_every = max(full_every, 1)
+        self.polls = 0
+        self.last_activity: dict[int, str] = {}
+        # INFO: Activity read this poll, only seen once the course synced
+        self.activity: dict[int, str] = {}
+
+    def due_courses(self) -> list[int]:
+        """
+        Decide which configured courses to sync this poll, most recently active first
+
+        :returns: Course IDs to sync
+        """
+        course_ids = self.canvas.local_config["course_ids"]
+        full = self.polls % self.full_every == 0
+        try:
+            activity = self.canvas.get_activity()
+        except (CanvasException, RequestException) as e:
+            logger.warning("Couldn't read activity stream, syncing everything (%s)", e)
+            activity, full = {}, True
+
+        due = [
+            id
+            for id in course_ids
+            if full or activity.get(id, "") > self.last_activity.get(id, "")
+        ]
+        self.activity = activity
+        return sorted(
+            due, key=lambda course_id: activity.get(course_id, ""), reverse=True
+        )
+
+    def mark_synced(self, id: int) -> None:
+        """Remember the course's activity so it isn't due again until there's more"""
+        if id in self.activity:
+            self.last_activity[id] = self.activity[id]
+
+    def poll(self) -> int:
+        """
+        Run one poll, reconnecting first if the last one lost the connection. A
+        course that fails is logged and skipped so the others still get synced
+
+        :returns: Number of new files downloaded
+        """
+        self.canvas.reload_config()
+        if not self.canvas.connected and not self.canvas.connect():
+            logger.warning("Canvas failed to connect, trying again next poll")
+            return 0
+        if self.canvas.session is not None:
+            self.canvas.session.reset_budget()
+
+        synchronizer = Synchronizer(self.canvas, orphan_action=self.orphan_action)
+        try:
+            for id in self.due_courses():
+                self.sync_course(synchronizer, id)
+        except RequestsConnectionError as e:
+            logger.warning("Lost the connection to Canvas, poll stopped early (%s)", e)
+            self.canvas.disconnect()
+        finally:
+            self.polls += 1
+            logger.info("Poll finished: %s", synchronizer.summary())
+
+        return synchronizer.download_count
+
+    def sync_course(self, synchronizer: Synchronizer, id: int) -> None:
+        """
+        Sync one course, logging a failure instead of raising it. Only a lost
+        connection is raised since the rest of the poll would fail the same way
+        """
+        try:
+            course = self.canvas.get_course(id)
+            new = synchronizer.sync_course(course)
+        except RequestsConnectionError:
+            raise
+        except (
+            CanvasException,
+            RequestException,
+            InvalidConfigurationError,
+            OSError,
+            sqlite3.Error,
+        ) as e:
+            logger.warning("Couldn't sync Course(%s) (%s)", id, e)
+            return
+        self.mark_synced(id)
+        logger.debug("Synced %d new files from %s", new, course.name)
+
+    def run(self) -> None:
+        logger.info("Watching courses every %s seconds", self.interval)
+        while True:
+            started = time.monotonic()
+            self.poll()
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
@@ -1,4 +1,82 @@
+import threading
+from types import SimpleNamespace
+
+from canvasapi.module import Module
+from canvasapi.page import Page
+from canvasapi.paginated_list import PaginatedList
+
+from cansync.api import CourseScan, ModuleScan, PageScan, paginate
+from cansync.types import FileRecord, ModuleItemType
+
+URL = "https://canvas.test"
+
+
+def make_canvas() -> SimpleNamespace:
+    return SimpleNamespace(
+        local_config={"url": URL},
+        get_file=lambda file_id: FileRecord(
+            file_id, f"{file_id}.pdf", 1, None, URL, None
+        ),
+    )
+
+
+class FakePages(PaginatedList):
+    """Serves pages from memory and records when each one is requested"""
+
+    def __init__(self, pages: list[list[int]]):
+        super().__init__(int, None, "GET", "items")
+        self.pages = pages
+        self.requested = [threading.Event() for _ in pages]
+
+    def _get_next_page(self) -> list[int]:
+        index = sum(event.is_set() for event in self.requested)
+        self.requested[index].set()
+        self._next_url = "items" if index + 1 < len(self.pages) else None
+        return self.pages[index]
+
+
 class TestAPI:
     def test_canvas(self) -> None: ...
 
     def test_scanner(self) -> None: ...
+
+    def test_page_links(self) -> None:
+        canvas = make_canvas()
+        course = CourseScan(SimpleNamespace(id=7), canvas)
+        body = (
+            f'<a href="{URL}/courses/7/files/11/download">a</a>'
+            f'<a href="{URL}/api/v1/courses/7/files/12">b</a>'
+            f'<a href="{URL}/courses/7/files/11">a again</a>'
+            f'<a href="{URL}/courses/7/quizzes/3">quiz</a>'
+            f'<a href="{URL}/courses/8/files/13">other course</a>'
+        )
+        page = PageScan(Page(None, {"page_id": 1, "body": body}), course, canvas)
+
+        assert [file.id for file in page.get_files()] == [11, 12]
+        assert page.links["quizzes"] == [3]
+        assert page.page.body is None
+
+    def test_module_items(self) -> None:
+        canvas = make_canvas()
+        course = CourseScan(SimpleNamespace(id=7), canvas)
+        items = [
+            {"id": 1, "type": "File", "title": "Slides", "content_id": 11},
+            {"id": 2, "type": "Page", "title": "Week 1", "page_url": "week-1"},
+        ]
+        module = ModuleScan(Module(None, {"id": 5, "items": items}), course, canvas)
+
+        assert [f.id for f in module.get_attachments()] == [11]
+        assert [i.page_url for i in module.items_by_type(ModuleItemType.PAGE)] == [
+            "week-1"
+        ]
+        assert not hasattr(module.module, "items")
+
+    def test_paginate(self) -> None:
+        pages = FakePages([[1, 2], [3], [4, 5]])
+        items = paginate(pages)
+
+        assert next(items) == 1
+        # The second page is requested while the first is still being consumed
+        assert pages.requested[1].wait(1)
+        assert list(items) == [2, 3, 4, 5]
+        assert list(paginate([6, 7])) == [6, 7]
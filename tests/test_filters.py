@@ -0,0 +1,70 @@
+import pytest
+import toml
+
+from cansync.errors import InvalidConfigurationError
+from cansync.filters import FileFilter, valid_filters
+from cansync.types import FileRecord
+
+
+def make_file(filename: str, size: int | None = None, content_type: str | None = None):
+    return FileRecord(1, filename, size, None, "https://canvas.test", content_type)
+
+
+class TestFilters:
+    def test_empty_filter(self):
+        assert FileFilter().accepts(make_file("lecture.mp4", 10**10, "video/mp4"))
+
+    def test_name_patterns(self):
+        file_filter = FileFilter(include=["*.pdf", "*.PPTX"], exclude=["draft*"])
+        assert file_filter.accepts(make_file("Week1.PDF"))
+        assert file_filter.accepts(make_file("slides.pptx"))
+        assert not file_filter.accepts(make_file("draft.pdf"))
+        assert not file_filter.accepts(make_file("notes.txt"))
+
+    def test_content_types(self):
+        file_filter = FileFilter(exclude_content_types=["video/*"])
+        assert not file_filter.accepts(make_file("a.bin", content_type="video/mp4"))
+        assert file_filter.accepts(make_file("a.bin", content_type="application/pdf"))
+        assert file_filter.accepts(make_file("a.bin"))
+
+        file_filter = FileFilter(content_types=["application/pdf"])
+        assert not file_filter.accepts(make_file("a.bin", content_type="text/plain"))
+
+    def test_max_size(self):
+        file_filter = FileFilter(max_size=100)
+        assert file_filter.accepts(make_file("a.pdf", 100))
+        assert not file_filter.accepts(make_file("a.pdf", 101))
+        assert file_filter.accepts(make_file("a.pdf"))
+
+    def test_course_override(self, test_data_path):
+        with open(test_data_path / "config_4.toml") as fp:
+            config = toml.load(fp)
+
+        video = make_file("lecture.mp4", 1000)
+        assert not FileFilter.from_config(config).accepts(video)
+        assert not FileFilter.from_config(config, 789123).accepts(video)
+        assert FileFilter.from_config(config, 123456).accepts(video)
+        max_size = config["filters"]["max_size"]
+        assert FileFilter.from_config(config, 123456).max_size == max_size
+
+    def test_invalid_config(self):
+        config = {"filters": {"exlcude": ["*.mp4"]}}
+        with pytest.raises(InvalidConfigurationError):
+            FileFilter.from_config(config)
+
+    @pytest.mark.parametrize(
+        "filters,expected",
+        [
+            [{}, True],
+            [{"exclude": ["*.mp4"], "max_size": 10}, True],
+            [{"courses": {"12": {"include": ["*.pdf"]}}}, True],
+            [{"courses": {"12": {"courses": {}}}}, False],
+            [{"courses": {"abc": {}}}, False],
+            [{"max_size": -1}, False],
+            [{"exclude": "*.mp4"}, False],
+            [{"unknown": []}, False],
+            [[], False],
+        ],
+    )
+    def test_valid_filters(self, filters, expected):
+        assert valid_filters(filters) == expected
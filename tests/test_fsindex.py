@@ -0,0 +1,27 @@
+from cansync.fsindex import LocalIndex
+
+
+class TestLocalIndex:
+    def test_scan(self, tmp_path):
+        (tmp_path / "a" / "b").mkdir(parents=True)
+        (tmp_path / "a" / "b" / "file.pdf").write_text("hi")
+        (tmp_path / ".ignored").mkdir()
+        (tmp_path / ".ignored" / "old.pdf").write_text("hi")
+
+        index = LocalIndex(tmp_path, ignore=(".ignored",))
+        assert index.is_file(tmp_path / "a" / "b" / "file.pdf")
+        assert not index.is_file(tmp_path / ".ignored" / "old.pdf")
+        assert not index.is_file(tmp_path / "a" / "b")
+        assert str(tmp_path / "a" / "b") in index.dirs
+
+    def test_make_dirs(self, tmp_path):
+        index = LocalIndex(tmp_path / "missing")
+        path = tmp_path / "missing" / "c" / "d"
+        index.make_dirs(path)
+        assert path.is_dir()
+        assert {str(path), str(path.parent)} <= index.dirs
+
+        index.add(path / "new.pdf")
+        assert index.is_file(path / "new.pdf")
+        index.discard(path / "new.pdf")
+        assert not index.is_file(path / "new.pdf")
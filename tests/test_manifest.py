@@ -0,0 +1,92 @@
+from cansync.manifest import Manifest
+
+
+class TestManifest:
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "manifest.json"
+        manifest = Manifest("~/Canvas", path)
+        manifest.set_course_signature(1, "abc")
+        manifest.record_module(1, 2, "def", [5], ["week-1"])
+        manifest.record_page(1, "week-1", "abc", [6])
+        manifest.save()
+
+        manifest = Manifest("~/Canvas", path)
+        assert manifest.course_signature(1) == "abc"
+        assert manifest.module_signature(1, 2) == "def"
+        assert manifest.module_signature(1, 3) is None
+        assert manifest.page_signature(1, "week-1") == "abc"
+
+    def test_storage_path_change(self, tmp_path):
+        path = tmp_path / "manifest.json"
+        manifest = Manifest("~/Canvas", path)
+        manifest.set_course_signature(1, "abc")
+        manifest.save()
+
+        assert Manifest("~/Elsewhere", path).course_signature(1) is None
+
+    def test_storage_backend_change(self, tmp_path):
+        path = tmp_path / "manifest.json"
+        manifest = Manifest("~/Canvas", path)
+        manifest.set_course_signature(1, "abc")
+        manifest.save()
+
+        assert Manifest("~/Canvas", path).course_signature(1) == "abc"
+        archive = Manifest("~/Canvas", path, storage_backend="archive")
+        assert archive.course_signature(1) is None
+
+    def test_corrupt(self, tmp_path):
+        path = tmp_path / "manifest.json"
+        path.write_text("{not json")
+        assert Manifest("~/Canvas", path).course_signature(1) is None
+
+    def test_reconcile(self, tmp_path):
+        manifest = Manifest("~/Canvas", tmp_path / "manifest.json")
+        manifest.record_module(1, 2, "a", [10], ["week-1"])
+        manifest.record_module(1, 3, "b", [11], [])
+        manifest.record_page(1, "week-1", None, [12])
+        for id in (10, 11, 12):
+            manifest.record_file(id, 1, f"course/{id}.pdf", 100)
+        manifest.record_file(20, 2, "other/20.pdf", 100)
+
+        assert manifest.reconcile(1, [2, 3]) == []
+        assert manifest.reconcile(1, [3]) == ["course/10.pdf", "course/12.pdf"]
+        assert manifest.file_path(11) == "course/11.pdf"
+        assert manifest.file_path(20) == "other/20.pdf"
+
+    def test_moved_file(self, tmp_path):
+        manifest = Manifest("~/Canvas", tmp_path / "manifest.json")
+        assert manifest.record_file(1, 1, "a/old.pdf", 1) is None
+        assert manifest.record_file(1, 1, "a/old.pdf", 1) is None
+        assert manifest.record_file(1, 1, "a/new.pdf", 1) == "a/old.pdf"
+
+    def test_case_only_rename(self, tmp_path):
+        manifest = Manifest("~/Canvas", tmp_path / "manifest.json")
+        manifest.record_file(1, 1, "C/Notes.pdf", 1, source="10")
+        assert manifest.record_file(1, 1, "C/notes.pdf", 1, source="10") is None
+
+        # The renamed path is still taken
+        assert manifest.assign_path(2, "10", "C/NOTES.pdf") == "C/NOTES (2).pdf"
+
+    def test_assign_path(self, tmp_path):
+        path = tmp_path / "manifest.json"
+        manifest = Manifest("~/Canvas", path)
+        assert manifest.assign_path(1, "10", "c/m/notes.pdf") == "c/m/notes.pdf"
+        manifest.record_file(
+            1, 1, "c/m/notes.pdf", 1, name="c/m/notes.pdf", source="10"
+        )
+
+        # Another file with the same name, only differing in case
+        assert manifest.assign_path(2, "10", "c/m/Notes.pdf") == "c/m/Notes (2).pdf"
+        manifest.record_file(
+            2, 1, "c/m/Notes (2).pdf", 1, name="c/m/Notes.pdf", source="10"
+        )
+        manifest.save()
+
+        manifest = Manifest("~/Canvas", path)
+        assert manifest.assign_path(2, "10", "c/m/Notes.pdf") == "c/m/Notes (2).pdf"
+        # Linked from somewhere else, stays where it is
+        assert manifest.assign_path(1, "11/page", "c/m/page/notes.pdf") == (
+            "c/m/notes.pdf"
+        )
+        # Renamed where it was found
+        assert manifest.assign_path(1, "10", "c/m/slides.pdf") == "c/m/slides.pdf"
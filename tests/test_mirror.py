@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from cansync.manifest import Manifest
+from cansync.mirror import PageMirror, rewrite_links
+from cansync.storage import DirectoryStorage
+
+URL = "https://canvas.test"
+
+
+class FakeModule(SimpleNamespace):
+    def items_by_type(self, type):
+        return iter(self.items)
+
+
+class TestMirror:
+    def test_rewrite_links(self):
+        body = (
+            f'<a href="{URL}/courses/7/files/11/download?wrap=1">a</a>'
+            '<img src="/courses/7/files/12/preview">'
+            "<a href='/courses/7/pages/week-2'>next</a>"
+            '<a href="/courses/8/files/13">other course</a>'
+        )
+
+        def resolve(resource, key):
+            return {"11": "Week 1/a.pdf", "week-2": "week-2.html"}.get(key)
+
+        assert rewrite_links(body, URL, 7, resolve) == (
+            '<a href="Week%201/a.pdf">a</a>'
+            f'<img src="{URL}/courses/7/files/12/preview">'
+            "<a href='week-2.html'>next</a>"
+            '<a href="/courses/8/files/13">other course</a>'
+        )
+
+    def test_save(self, tmp_path):
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        manifest.record_file(11, 7, "Course/Week-1/slides.pdf", 1)
+        storage = DirectoryStorage(tmp_path)
+        module = FakeModule(items=[SimpleNamespace(page_url="week-2")])
+        course = SimpleNamespace(id=7, name="Course", modules=[module])
+
+        mirror = PageMirror(manifest, storage, URL)
+        body = (
+            '<a href="/courses/7/files/11">slides</a>'
+            '<a href="/courses/7/pages/week-2">next</a>'
+        )
+        path = mirror.save(course, "week-1", "Week <1>", body)
+
+        assert path == "Course/Pages/week-1.html"
+        page = (tmp_path / path).read_text()
+        assert "<title>Week &lt;1&gt;</title>" in page
+        assert 'href="../Week-1/slides.pdf"' in page
+        assert 'href="week-2.html"' in page
+        assert storage.exists(path)
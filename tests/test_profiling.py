@@ -0,0 +1,28 @@
+from cansync import profiling
+
+
+@profiling.timed("outer")
+def outer():
+    inner()
+    inner()
+
+
+@profiling.timed("inner")
+def inner():
+    sum(range(1000))
+
+
+class TestProfiling:
+    def test_profile(self, tmp_path, capsys):
+        with profiling.profile("sync", directory=tmp_path) as timer:
+            outer()
+
+        assert timer.calls == {"outer": 1, "inner": 2}
+        assert set(timer.wall) == {"outer", "inner"}
+        assert len(list(tmp_path.glob("sync-*.prof"))) == 1
+        assert "inner" in next(tmp_path.glob("sync-*.txt")).read_text()
+        assert "Profile written to" in capsys.readouterr().out
+
+        # Nothing is timed outside of a profiled run
+        outer()
+        assert timer.calls == {"outer": 1, "inner": 2}
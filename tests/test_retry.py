@@ -0,0 +1,98 @@
+from http import HTTPStatus
+
+import pytest
+import requests
+import requests_mock
+from requests.exceptions import ConnectTimeout
+
+from cansync.errors import InvalidConfigurationError
+from cansync.retry import CircuitBreaker, RetryPolicy, RetrySession, valid_retry
+
+URL = "https://canvas.test/api/v1/courses"
+
+
+def make_session(**policy) -> tuple[RetrySession, requests_mock.Adapter]:
+    session = RetrySession(RetryPolicy(backoff=0, breaker_cooldown=0, **policy))
+    adapter = requests_mock.Adapter()
+    session.mount("https://", adapter)
+    return session, adapter
+
+
+class TestRetry:
+    def test_retries_server_errors(self):
+        session, adapter = make_session()
+        responses = [{"status_code": 503}, {"status_code": 502}, {"json": []}]
+        adapter.register_uri("GET", URL, responses)
+        assert session.get(URL).status_code == HTTPStatus.OK
+        assert adapter.call_count == len(responses)
+        assert session.retries_left == session.policy.budget - 2
+
+    def test_gives_up(self):
+        session, adapter = make_session(attempts=3)
+        adapter.register_uri("GET", URL, status_code=500)
+        assert session.get(URL).status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+        assert adapter.call_count == session.policy.attempts
+
+        adapter.register_uri("GET", URL, exc=ConnectTimeout)
+        with pytest.raises(ConnectTimeout):
+            session.get(URL)
+
+    def test_no_retry(self):
+        session, adapter = make_session()
+        adapter.register_uri("GET", URL, status_code=404)
+        adapter.register_uri("POST", URL, status_code=503)
+        assert session.get(URL).status_code == HTTPStatus.NOT_FOUND
+        assert session.post(URL).status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert [r.method for r in adapter.request_history] == ["GET", "POST"]
+
+    def test_budget(self):
+        session, adapter = make_session(budget=1)
+        adapter.register_uri("GET", URL, status_code=500)
+        session.get(URL)
+        assert adapter.call_count == 1 + session.policy.budget
+        session.get(URL)
+        assert adapter.call_count == 2 + session.policy.budget
+
+        session.reset_budget()
+        assert session.retries_left == 1
+
+    def test_rate_limit(self):
+        session, adapter = make_session()
+        adapter.register_uri(
+            "GET",
+            URL,
+            [{"status_code": 403, "text": "403 Rate Limit Exceeded"}, {"json": []}],
+        )
+        assert session.get(URL).status_code == HTTPStatus.OK
+
+    def test_closes_retried_responses(self, monkeypatch):
+        closed = []
+
+        def close(response):
+            closed.append(response)
+
+        monkeypatch.setattr(requests.Response, "close", close)
+        session, adapter = make_session()
+        adapter.register_uri("GET", URL, [{"status_code": 503}, {"json": []}])
+        response = session.get(URL, stream=True)
+        assert [r.status_code for r in closed] == [HTTPStatus.SERVICE_UNAVAILABLE]
+        assert response not in closed
+
+    def test_breaker(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.failure()
+        assert breaker.opened_at is None
+        breaker.failure()
+        assert breaker.opened_at is not None
+        breaker.success()
+        assert breaker.opened_at is None and breaker.failures == 0
+
+    def test_valid_retry(self):
+        assert valid_retry({"attempts": 3, "timeout": 2.5})
+        assert not valid_retry({"attempts": -1})
+        assert not valid_retry({"tries": 3})
+        assert not valid_retry([])
+
+    def test_invalid_config(self):
+        with pytest.raises(InvalidConfigurationError):
+            RetryPolicy.from_config({"retry": {"attempt": 3}})
@@ -0,0 +1,65 @@
+import zipfile
+
+from cansync.extract import extract_text
+from cansync.search import SearchIndex, fts_query
+from cansync.storage import DirectoryStorage
+
+
+def write_docx(path, text):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="urn:w"><w:body><w:p><w:r>'
+            f"<w:t>{text}</w:t></w:r></w:p></w:body></w:document>",
+        )
+
+
+class TestSearch:
+    def test_extract_text(self, tmp_path):
+        (tmp_path / "page.html").write_text(
+            "<h1>Mitosis</h1><script>var x;</script><p>Cell division</p>"
+        )
+        write_docx(tmp_path / "notes.docx", "Meiosis")
+        (tmp_path / "video.mp4").write_bytes(b"\x00")
+        (tmp_path / "broken.docx").write_bytes(b"not a zip")
+        with zipfile.ZipFile(tmp_path / "entities.docx", "w") as archive:
+            archive.writestr(
+                "word/document.xml",
+                '<!DOCTYPE d [<!ENTITY a "aaaa">]><d>&a;&a;</d>',
+            )
+
+        assert extract_text(tmp_path / "page.html").split() == [
+            "Mitosis",
+            "Cell",
+            "division",
+        ]
+        assert extract_text(tmp_path / "notes.docx") == "Meiosis"
+        assert extract_text(tmp_path / "video.mp4") == ""
+        assert extract_text(tmp_path / "broken.docx") == ""
+        assert extract_text(tmp_path / "entities.docx") == ""
+
+    def test_fts_query(self):
+        assert fts_query('C++ "intro"') == '"C++" """intro"""'
+
+    def test_update_course(self, tmp_path):
+        root = tmp_path / "storage"
+        (root / "Bio").mkdir(parents=True)
+        (root / "Bio" / "cells.txt").write_text("The mitochondria is the powerhouse")
+        write_docx(root / "Bio" / "notes.docx", "Ribosomes make proteins")
+        storage = DirectoryStorage(root)
+        index = SearchIndex(tmp_path / "search.db")
+
+        stored = ["Bio/cells.txt", "Bio/notes.docx"]
+        paths = [*stored, "Bio/missing.pdf"]
+        assert index.update_course(storage, 1, paths) == len(stored)
+        assert index.update_course(storage, 1, paths) == 0
+        assert [r.path for r in index.search("mitochondria")] == ["Bio/cells.txt"]
+        assert [r.path for r in index.search("notes")] == ["Bio/notes.docx"]
+        assert "[proteins]" in index.search("proteins")[0].snippet
+
+        (root / "Bio" / "cells.txt").write_text("Changed to be about chloroplasts")
+        assert index.update_course(storage, 1, ["Bio/cells.txt"]) == 1
+        assert index.search("mitochondria") == []
+        assert index.search("ribosomes") == []
+        assert [r.path for r in index.search("chloroplasts")] == ["Bio/cells.txt"]
+        index.close()
@@ -0,0 +1,67 @@
+import hashlib
+import tarfile
+
+import pytest
+
+from cansync.storage import ArchiveStorage, DirectoryStorage
+from cansync.verify import hash_file
+
+
+def writer(data):
+    return lambda path: path.write_bytes(data)
+
+
+class TestStorage:
+    def test_directory(self, tmp_path):
+        storage = DirectoryStorage(tmp_path)
+        storage.store("Course/Week 1/a.pdf", writer(b"slides"))
+
+        assert storage.exists("Course/Week 1/a.pdf")
+        assert storage.read("Course/Week 1/a.pdf", 2, 3) == b"ide"
+
+        storage.move("Course/Week 1/a.pdf", "Quarantine/a.pdf")
+        assert not (tmp_path / "Course").exists()
+        storage.remove("Quarantine/a.pdf")
+        assert not storage.exists("Quarantine/a.pdf")
+
+    def test_archive(self, tmp_path):
+        storage = ArchiveStorage(tmp_path)
+        storage.store("Course/a.pdf", writer(b"first"))
+        storage.store("Course/b.txt", writer(b"x" * 1000))
+        storage.store("Course/a.pdf", writer(b"replaced"))
+        storage.store("Course/empty.txt", writer(b""))
+        storage.move("Course/b.txt", "Quarantine/Course/b.txt")
+        storage.save()
+
+        reloaded = ArchiveStorage(tmp_path)
+        assert not reloaded.exists("Course/b.txt")
+        assert reloaded.stat("Course/a.pdf")[0] == len(b"replaced")
+        assert reloaded.read("Course/a.pdf") == b"replaced"
+        assert reloaded.read("Quarantine/Course/b.txt", 998) == b"xx"
+        assert reloaded.read("Course/empty.txt") == b""
+        with reloaded.local_path("Course/a.pdf") as path:
+            assert path.name == "a.pdf"
+            assert path.read_bytes() == b"replaced"
+
+        file, offset, size = reloaded.locate("Course/a.pdf")
+        digest = hashlib.sha256(b"replaced").hexdigest()
+        assert hash_file(str(file), offset, size) == digest
+
+        with tarfile.open(reloaded.path) as archive:
+            members = {m.name: m for m in archive.getmembers()}
+            assert archive.extractfile(members["Course/a.pdf"]).read() == b"replaced"
+
+    def test_archive_failed_write(self, tmp_path):
+        storage = ArchiveStorage(tmp_path)
+        storage.store("a.pdf", writer(b"kept"))
+
+        def fail(path):
+            path.write_bytes(b"partial")
+            e = "Connection lost"
+            raise OSError(e)
+
+        with pytest.raises(OSError):
+            storage.store("b.pdf", fail)
+        assert not storage.exists("b.pdf")
+        assert storage.read("a.pdf") == b"kept"
+        assert [p.name for p in tmp_path.iterdir()] == ["cansync.tar"]
@@ -0,0 +1,310 @@
+from http import HTTPStatus
+from types import SimpleNamespace
+
+from canvasapi.exceptions import CanvasException
+from requests import Response
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import HTTPError
+
+from cansync.manifest import Manifest
+from cansync.search import SearchIndex
+from cansync.sync import Synchronizer
+from cansync.types import FileRecord
+
+
+class FakeModule(SimpleNamespace):
+    def signature(self):
+        return self.sig
+
+    def get_attachments(self):
+        self.scanned += 1
+        return iter(getattr(self, "attachments", ()))
+
+    def get_pages(self, skip=None):
+        return iter(getattr(self, "pages", ()))
+
+    def items_by_type(self, type):
+        pages = getattr(self, "pages", ())
+        return iter(SimpleNamespace(page_url=page.page.url) for page in pages)
+
+
+class FakeCourse(SimpleNamespace):
+    def signature(self):
+        return "-".join(m.sig for m in self.modules)
+
+    def get_modules(self):
+        return iter(self.modules)
+
+
+class FakeFolderCourse(SimpleNamespace):
+    def folders_signature(self):
+        return str(len(self.files))
+
+    def get_folder_files(self):
+        for file in self.files:
+            if file is None:
+                e = "Internal server error"
+                raise CanvasException(e)
+            yield file
+
+
+class TestSynchronizer:
+    def test_skip_unchanged(self, tmp_path):
+        canvas = SimpleNamespace(local_config={"storage_path": str(tmp_path)})
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        modules = [
+            FakeModule(id=1, sig="a", scanned=0),
+            FakeModule(id=2, sig="b", scanned=0),
+        ]
+        course = FakeCourse(id=10, name="Course", modules=modules, page_updates={})
+
+        synchronizer = Synchronizer(canvas, manifest=manifest)
+        synchronizer.sync_course(course)
+        assert [m.scanned for m in modules] == [1, 1]
+
+        # Nothing changed so the whole course is skipped
+        synchronizer.sync_course(course)
+        assert [m.scanned for m in modules] == [1, 1]
+        assert synchronizer.stats["courses_skipped"] == 1
+        assert "1 unchanged courses skipped" in synchronizer.summary()
+
+        # Only the changed module is scanned again
+        modules[1].sig = "c"
+        synchronizer.sync_course(course)
+        assert [m.scanned for m in modules] == [1, 2]
+
+        Synchronizer(canvas, full=True, manifest=manifest).sync_course(course)
+        assert [m.scanned for m in modules] == [2, 3]
+
+    def test_failed_downloads_rescanned(self, tmp_path):
+        def download(url, path, size):
+            if fail:
+                raise RequestsConnectionError
+            path.write_bytes(b"x")
+            return "checksum"
+
+        canvas = SimpleNamespace(
+            local_config={"storage_path": str(tmp_path)},
+            downloader=SimpleNamespace(download=download),
+        )
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        module = FakeModule(id=1, name="Week 1", sig="a", scanned=0)
+        module.attachments = [FileRecord(5, "notes.pdf", 1, None, "", None)]
+        course = FakeCourse(id=10, name="Course", modules=[module], page_updates={})
+
+        fail = True
+        synchronizer = Synchronizer(canvas, manifest=manifest)
+        assert synchronizer.sync_course(course) == 0
+        assert "1 failed" in synchronizer.summary()
+        assert manifest.course_signature(10) is None
+        assert manifest.module_signature(10, 1) is None
+
+        fail = False
+        scanned = module.scanned
+        assert Synchronizer(canvas, manifest=manifest).sync_course(course) == 1
+        assert module.scanned == scanned + 1
+        assert manifest.checksum(5) == "checksum"
+        assert manifest.module_signature(10, 1) is not None
+
+        # Signatures recorded by an earlier run are forgotten too
+        fail = True
+        (tmp_path / "Course" / "Week-1" / "notes.pdf").unlink()
+        Synchronizer(canvas, full=True, manifest=manifest).sync_course(course)
+        assert manifest.course_signature(10) is None
+        assert manifest.module_signature(10, 1) is None
+        scanned = module.scanned
+        Synchronizer(canvas, manifest=manifest).sync_course(course)
+        assert module.scanned == scanned + 1
+
+    def test_denied_downloads_recorded(self, tmp_path):
+        def download(url, path, size):
+            attempts.append(url)
+            response = Response()
+            response.status_code = HTTPStatus.FORBIDDEN
+            e = "Forbidden"
+            raise HTTPError(e, response=response)
+
+        attempts = []
+        canvas = SimpleNamespace(
+            local_config={"storage_path": str(tmp_path)},
+            downloader=SimpleNamespace(download=download),
+        )
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        module = FakeModule(id=1, name="Week 1", sig="a", scanned=0)
+        locked = FileRecord(5, "notes.pdf", 1, "2024-01-01", "v1", None)
+        module.attachments = [locked]
+        course = FakeCourse(id=10, name="Course", modules=[module], page_updates={})
+
+        synchronizer = Synchronizer(canvas, manifest=manifest)
+        synchronizer.sync_course(course)
+        assert "1 denied" in synchronizer.summary()
+        assert "0 failed" in synchronizer.summary()
+        assert manifest.course_signature(10) is not None
+        assert manifest.module_signature(10, 1) is not None
+
+        # Only tried again once the file is updated
+        Synchronizer(canvas, full=True, manifest=manifest).sync_course(course)
+        assert attempts == ["v1"]
+        module.attachments = [locked._replace(updated_at="2024-02-01", url="v2")]
+        Synchronizer(canvas, full=True, manifest=manifest).sync_course(course)
+        assert attempts == ["v1", "v2"]
+
+    def test_filter_change_rescans_modules(self, tmp_path):
+        canvas = SimpleNamespace(local_config={"storage_path": str(tmp_path)})
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        module = FakeModule(id=1, sig="a", scanned=0)
+        course = FakeCourse(id=10, name="Course", modules=[module], page_updates={})
+
+        Synchronizer(canvas, manifest=manifest).sync_course(course)
+        scanned = module.scanned
+        canvas.local_config["filters"] = {"exclude": ["*.mp4"]}
+        Synchronizer(canvas, manifest=manifest).sync_course(course)
+        assert module.scanned == scanned + 1
+
+    def test_orphans(self, tmp_path):
+        canvas = SimpleNamespace(local_config={"storage_path": str(tmp_path)})
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        (tmp_path / "course" / "module").mkdir(parents=True)
+        (tmp_path / "course" / "module" / "old.pdf").write_text("old")
+        (tmp_path / "course" / "kept.pdf").write_text("kept")
+
+        synchronizer = Synchronizer(
+            canvas, manifest=manifest, orphan_action="quarantine"
+        )
+        synchronizer.handle_orphans(["course/module/old.pdf", "course/missing.pdf"])
+
+        assert synchronizer.orphans == [tmp_path / "course" / "module" / "old.pdf"]
+        assert (
+            tmp_path / ".cansync-orphans" / "course" / "module" / "old.pdf"
+        ).is_file()
+        assert not (tmp_path / "course" / "module").exists()
+        assert (tmp_path / "course" / "kept.pdf").is_file()
+
+    def test_folders(self, tmp_path):
+        downloader = SimpleNamespace(
+            download=lambda url, path, size: path.write_bytes(b"x" * size)
+        )
+        canvas = SimpleNamespace(
+            local_config={"storage_path": str(tmp_path), "sync_mode": "files"},
+            downloader=downloader,
+        )
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        slides = SimpleNamespace(id=2, parts=["Week 1", "Slides"], name="Slides")
+        files = [
+            (slides, FileRecord(1, "intro.pdf", 1, None, "", None)),
+            (slides, FileRecord(2, "Intro.pdf", 2, None, "", None)),
+            (slides, FileRecord(1, "intro.pdf", 1, None, "", None)),
+        ]
+        course = FakeFolderCourse(id=10, name="My Course", folders={2: slides})
+        course.files = files
+
+        synchronizer = Synchronizer(canvas, manifest=manifest)
+        assert synchronizer.sync_course(course) == len({file.id for _, file in files})
+
+        folder = tmp_path / "My-Course" / "Week-1" / "Slides"
+        assert (folder / "intro.pdf").read_bytes() == b"x"
+        assert (folder / "Intro (2).pdf").read_bytes() == b"xx"
+        assert manifest.reconcile(10, []) == []
+
+    def test_archive_storage(self, tmp_path):
+        downloader = SimpleNamespace(
+            download=lambda url, path, size: path.write_bytes(b"x" * size)
+        )
+        canvas = SimpleNamespace(
+            local_config={
+                "storage_path": str(tmp_path),
+                "sync_mode": "files",
+                "storage_backend": "archive",
+            },
+            downloader=downloader,
+        )
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        slides = SimpleNamespace(id=2, parts=["Slides"], name="Slides")
+        course = FakeFolderCourse(id=10, name="Course", folders={2: slides})
+        course.files = [(slides, FileRecord(1, "intro.pdf", 3, None, "", None))]
+
+        assert Synchronizer(canvas, manifest=manifest).sync_course(course) == 1
+        assert not (tmp_path / "Course").exists()
+
+        # Stored once, the next run finds it in the saved archive index
+        course.files.append((slides, FileRecord(2, "week.pdf", 1, None, "", None)))
+        synchronizer = Synchronizer(canvas, manifest=manifest)
+        assert synchronizer.sync_course(course) == 1
+        assert synchronizer.storage.read("Course/Slides/intro.pdf") == b"xxx"
+
+    def test_partial_folder_listing(self, tmp_path):
+        downloader = SimpleNamespace(
+            download=lambda url, path, size: path.write_bytes(b"x" * size)
+        )
+        canvas = SimpleNamespace(
+            local_config={"storage_path": str(tmp_path), "sync_mode": "files"},
+            downloader=downloader,
+        )
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        slides = SimpleNamespace(id=2, parts=["Slides"], name="Slides")
+        course = FakeFolderCourse(id=10, name="Course", folders={2: slides})
+        course.files = [
+            (slides, FileRecord(1, "intro.pdf", 1, None, "", None)),
+            (slides, FileRecord(2, "week.pdf", 1, None, "", None)),
+        ]
+        Synchronizer(canvas, manifest=manifest).sync_course(course)
+
+        # The listing fails after the first file, the second is still on Canvas
+        course.files = [course.files[0], None, course.files[1]]
+        synchronizer = Synchronizer(canvas, manifest=manifest, orphan_action="delete")
+        synchronizer.sync_course(course)
+
+        assert synchronizer.orphans == []
+        assert (tmp_path / "Course" / "Slides" / "week.pdf").is_file()
+        assert manifest.course_signature(10) is None
+
+    def test_search_index_enabled(self, tmp_path):
+        downloader = SimpleNamespace(
+            download=lambda url, path, size: path.write_text("mitochondria")
+        )
+        canvas = SimpleNamespace(
+            local_config={"storage_path": str(tmp_path), "sync_mode": "files"},
+            downloader=downloader,
+        )
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        slides = SimpleNamespace(id=2, parts=["Slides"], name="Slides")
+        course = FakeFolderCourse(id=10, name="Course", folders={2: slides})
+        course.files = [(slides, FileRecord(1, "cells.txt", 12, None, "", None))]
+        Synchronizer(canvas, manifest=manifest).sync_course(course)
+
+        # Nothing changed on Canvas but the existing files still get indexed
+        canvas.local_config["search_index"] = True
+        synchronizer = Synchronizer(canvas, manifest=manifest)
+        synchronizer.search = SearchIndex(tmp_path / "search.db")
+        synchronizer.sync_course(course)
+
+        assert synchronizer.stats["courses_skipped"] == 0
+        results = synchronizer.search.search("mitochondria")
+        assert [r.path for r in results] == ["Course/Slides/cells.txt"]
+
+    def test_page_text_indexed(self, tmp_path):
+        canvas = SimpleNamespace(
+            local_config={
+                "storage_path": str(tmp_path),
+                "url": "https://canvas.test",
+                "search_index": True,
+            }
+        )
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        page = SimpleNamespace(
+            page=SimpleNamespace(url="week-1", body="<p>Photosynthesis</p>"),
+            name="Week 1",
+            empty=False,
+            get_files=lambda: iter(()),
+        )
+        module = FakeModule(id=1, name="Week 1", sig="a", scanned=0, pages=[page])
+        course = FakeCourse(id=10, name="Course", modules=[module], page_updates={})
+        synchronizer = Synchronizer(canvas, manifest=manifest)
+        synchronizer.search = SearchIndex(tmp_path / "search.db")
+        synchronizer.sync_course(course)
+
+        # Without mirror_pages the page is found on Canvas
+        results = synchronizer.search.search("photosynthesis")
+        assert [r.path for r in results] == [
+            "https://canvas.test/courses/10/pages/week-1"
+        ]
@@ -0,0 +1,122 @@
+import hashlib
+import re
+
+import pytest
+import requests
+import requests_mock
+
+from cansync.errors import IncompleteDownloadError, InvalidConfigurationError
+from cansync.transfer import (
+    Downloader,
+    DownloadOptions,
+    RateLimiter,
+    RateWindow,
+    valid_downloads,
+)
+
+URL = "https://canvas.test/files/1/download"
+DATA = bytes(range(256)) * 40
+CHECKSUM = hashlib.sha256(DATA).hexdigest()
+
+
+def ranged_content(request, context) -> bytes:
+    match = re.fullmatch(r"bytes=(\d+)-(\d+)", request.headers.get("Range", ""))
+    if match is None:
+        return DATA
+
+    start, end = int(match[1]), int(match[2])
+    context.status_code = 206
+    context.headers["Content-Range"] = f"bytes {start}-{end}/{len(DATA)}"
+    return DATA[start : end + 1]
+
+
+def make_downloader(**options) -> tuple[Downloader, requests_mock.Adapter]:
+    session = requests.Session()
+    adapter = requests_mock.Adapter()
+    session.mount("https://", adapter)
+    return Downloader(session, "key", DownloadOptions(**options)), adapter
+
+
+class TestDownloader:
+    def test_stream(self, tmp_path):
+        downloader, adapter = make_downloader()
+        adapter.register_uri("GET", URL, content=DATA)
+        checksum = downloader.download(URL, tmp_path / "a.bin", len(DATA))
+        assert (tmp_path / "a.bin").read_bytes() == DATA
+        assert checksum == CHECKSUM
+        assert adapter.last_request.headers["Authorization"] == "Bearer key"
+
+    def test_segmented(self, tmp_path):
+        downloader, adapter = make_downloader(
+            segment_threshold=1000, segments=3, chunk_size=100
+        )
+        adapter.register_uri("GET", URL, content=ranged_content)
+        checksum = downloader.download(URL, tmp_path / "a.bin", len(DATA))
+        assert (tmp_path / "a.bin").read_bytes() == DATA
+        assert checksum == CHECKSUM
+        # Probe plus one request per segment
+        assert adapter.call_count == 1 + downloader.options.segments
+
+    def test_ranges_unsupported(self, tmp_path):
+        downloader, adapter = make_downloader(segment_threshold=1000)
+        adapter.register_uri("GET", URL, content=DATA)
+        checksum = downloader.download(URL, tmp_path / "a.bin", len(DATA))
+        assert (tmp_path / "a.bin").read_bytes() == DATA
+        assert checksum == CHECKSUM
+        assert adapter.call_count == 1
+
+    def test_wrong_size(self, tmp_path):
+        downloader, adapter = make_downloader()
+        adapter.register_uri("GET", URL, content=DATA[:100])
+        with pytest.raises(IncompleteDownloadError):
+            downloader.download(URL, tmp_path / "a.bin", len(DATA))
+        assert list(tmp_path.iterdir()) == []
+
+    def test_valid_downloads(self):
+        assert valid_downloads({"segments": 8})
+        assert not valid_downloads({"segments": 0})
+        assert not valid_downloads({"threads": 2})
+
+    def test_schedule_config(self):
+        config = {
+            "downloads": {
+                "rate_limit": 1000,
+                "schedule": [{"start": "22:00", "end": "06:30", "rate_limit": 0}],
+            }
+        }
+        assert valid_downloads(config["downloads"])
+        options = DownloadOptions.from_config(config)
+        assert options.schedule == (RateWindow(22 * 60, 6 * 60 + 30, 0),)
+        assert not valid_downloads({"schedule": [{"start": "25:00", "end": "06:00"}]})
+
+    @pytest.mark.parametrize(
+        "downloads",
+        [
+            {"segment": 8},
+            {"schedule": [{"start": "9:00", "end": "17:00", "rate_limit": 10}]},
+        ],
+    )
+    def test_invalid_config(self, downloads):
+        with pytest.raises(InvalidConfigurationError):
+            DownloadOptions.from_config({"downloads": downloads})
+
+    def test_window(self):
+        overnight = RateWindow(22 * 60, 6 * 60, 0)
+        assert overnight.contains(23 * 60)
+        assert overnight.contains(60)
+        assert not overnight.contains(12 * 60)
+        assert RateWindow(9 * 60, 17 * 60, 10).contains(12 * 60)
+
+    def test_rate_limiter(self, monkeypatch):
+        slept = []
+        monkeypatch.setattr("cansync.transfer.time.sleep", slept.append)
+        limiter = RateLimiter(1000)
+        limiter.consume(250)
+        limiter.consume(500)
+        # The bucket starts empty and no time passes, so the debt keeps growing
+        assert slept == pytest.approx([0.25, 0.75], abs=0.01)
+        assert limiter.read_size(1024**2) == 16 * 1024
+
+        slept.clear()
+        RateLimiter(0).consume(10**9)
+        assert slept == []
@@ -0,0 +1,53 @@
+from pytermgui import keys
+
+from cansync.tui.shared import CourseList
+from cansync.types import CourseInfo
+
+
+def make_list(count: int = 50, rows: int = 5) -> CourseList:
+    courses = [CourseInfo(f"Course {i}", i) for i in range(count)]
+    return CourseList(courses, [1], rows=rows)
+
+
+class TestCourseList:
+    def test_search(self):
+        course_list = make_list()
+        for key in "se 1":
+            course_list.handle_key(key)
+        assert course_list.query == "se 1"
+        ids = [course_list.courses[i].id for i in course_list.matches]
+        assert ids == [1, *range(10, 20)]
+
+        course_list.handle_key(keys.BACKSPACE)
+        course_list.handle_key(keys.BACKSPACE)
+        assert len(course_list.matches) == len(course_list.courses)
+
+    def test_set_courses(self):
+        course_list = make_list()
+        course_list.search("course 4")
+        courses = course_list.courses
+        course_list.set_courses([CourseInfo("Course 4", 4), CourseInfo("Other", 7)])
+        # Swapped in when the list is drawn, not by the refreshing thread
+        assert course_list.courses is courses
+
+        course_list.get_lines()
+        assert [course_list.courses[i].id for i in course_list.matches] == [4]
+
+    def test_scrolling(self):
+        course_list = make_list()
+        assert not course_list.handle_key(keys.UP)
+        for _ in range(7):
+            course_list.handle_key(keys.DOWN)
+        assert (course_list.cursor, course_list.offset) == (7, 3)
+        assert len(course_list.get_lines()) == course_list.height
+
+    def test_select(self):
+        course_list = make_list()
+        course_list.handle_key(keys.ENTER)
+        assert course_list.enabled == {0, 1}
+
+        course_list.search("course 4")
+        course_list.handle_key(keys.CTRL_A)
+        assert course_list.enabled == {0, 1, 4, *range(40, 50)}
+        course_list.handle_key(keys.CTRL_D)
+        assert course_list.enabled == {0, 1}
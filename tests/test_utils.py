@@ -3,6 +3,10 @@ from pathlib import Path
 import pytest
 import toml
 from cansync import utils
+from cansync.types import CourseInfo
+
+# INFO: File name limit in bytes of most file systems
+MAX_NAME_BYTES = 255
 
 
 class TestUtils:
@@ -18,6 +22,15 @@ class TestUtils:
         long = "Brilliant Course (By Bob and John) (918212, )"
         assert utils.better_course_name(long) == "Brilliant Course (By Bob and John)"
 
+    def test_sanitize_name(self):
+        assert utils.sanitize_name("Week 1/2: Intro?.pdf") == "Week 1_2_ Intro_.pdf"
+        assert utils.sanitize_name("con.txt") == "_con.txt"
+        assert utils.sanitize_name(" notes. ") == "notes"
+        assert utils.sanitize_name("...") == "_"
+
+        long = utils.sanitize_name("a" * 300 + ".pdf")
+        assert long.endswith(".pdf") and len(long.encode()) < MAX_NAME_BYTES
+
     def test_create_dir(self, tmp_path):
         path = Path(tmp_path) / "test2" / "test3"
         utils.create_dir(path)
@@ -32,6 +45,7 @@ class TestUtils:
             ["config_1.toml", "complete"],
             ["config_2.toml", "incomplete"],
             ["config_3.toml", "invalid"],
+            ["config_4.toml", "complete"],
         ],
     )
     def test_config_properties(
@@ -66,3 +80,12 @@ class TestUtils:
         ]
 
     def test_download(self): ...
+
+    def test_course_cache(self, tmp_path):
+        path = Path(tmp_path) / "courses.json"
+        assert utils.get_course_cache("https://a.com", path) is None
+
+        courses = [CourseInfo("Course A", 1), CourseInfo("Course B", 2)]
+        utils.set_course_cache("https://a.com", courses, path)
+        assert utils.get_course_cache("https://a.com", path) == courses
+        assert utils.get_course_cache("https://b.com", path) is None
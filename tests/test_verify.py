@@ -0,0 +1,51 @@
+from cansync.manifest import Manifest
+from cansync.storage import DirectoryStorage
+from cansync.verify import Verifier, hash_file
+
+
+class TestVerifier:
+    def test_check(self, tmp_path):
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        (tmp_path / "ok.pdf").write_bytes(b"ok")
+        (tmp_path / "new.pdf").write_bytes(b"new")
+        (tmp_path / "short.pdf").write_bytes(b"short")
+        (tmp_path / "changed.pdf").write_bytes(b"changed")
+        (tmp_path / "empty.pdf").write_bytes(b"")
+        files = {
+            1: ("ok.pdf", 2),
+            2: ("new.pdf", 3),
+            3: ("short.pdf", 100),
+            4: ("changed.pdf", 7),
+            5: ("missing.pdf", 1),
+            6: ("empty.pdf", 0),
+        }
+        checksum = hash_file(str(tmp_path / "ok.pdf"))
+        for id, (path, size) in files.items():
+            manifest.record_file(
+                id, 1, path, size, checksum=checksum if id in (1, 4) else None
+            )
+
+        results = Verifier(manifest, DirectoryStorage(tmp_path), workers=2).check()
+        statuses = {result.id: result.status for result in results}
+
+        assert statuses == {
+            1: "ok",
+            2: "unknown",
+            3: "size",
+            4: "checksum",
+            5: "missing",
+            6: "unknown",
+        }
+        # Verifying never makes up a checksum to compare against later
+        assert manifest.checksum(2) is None
+
+    def test_checksum_reset(self, tmp_path):
+        manifest = Manifest(str(tmp_path), tmp_path / "manifest.json")
+        manifest.record_file(1, 1, "a.pdf", 1)
+        manifest.set_checksum(1, "abc")
+        manifest.record_file(1, 1, "a.pdf", 1)
+        assert manifest.checksum(1) == "abc"
+        manifest.record_file(1, 1, "a.pdf", 1, checksum="def")
+        assert manifest.checksum(1) == "def"
+        manifest.record_file(1, 1, "b.pdf", 1)
+        assert manifest.checksum(1) is None
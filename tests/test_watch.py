@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from cansync.watch import Watcher
+
+
+def make_canvas(course_ids: list[int], activity: dict[int, str]):
+    return SimpleNamespace(
+        local_config={"course_ids": course_ids}, get_activity=lambda: dict(activity)
+    )
+
+
+class TestWatcher:
+    def test_due_courses(self):
+        activity = {1: "2024-01-01T00:00:00Z", 2: "2024-02-01T00:00:00Z"}
+        canvas = make_canvas([1, 2, 3], activity)
+        watcher = Watcher(canvas, interval=0, full_every=3)
+
+        # First poll is a full one, most recent activity first
+        assert watcher.due_courses() == [2, 1, 3]
+        for id in (1, 2, 3):
+            watcher.mark_synced(id)
+        watcher.polls += 1
+        assert watcher.due_courses() == []
+        watcher.polls += 1
+
+        # Still due until it synced
+        activity[1] = "2024-03-01T00:00:00Z"
+        assert watcher.due_courses() == [1]
+        assert watcher.due_courses() == [1]
+        watcher.mark_synced(1)
+        assert watcher.due_courses() == []
+        watcher.polls += 1
+        assert watcher.due_courses() == [1, 2, 3]
+
+    def test_poll_survives_failures(self, monkeypatch):
+        errors = {1: OSError("disk full"), 3: RequestsConnectionError("lost")}
+
+        class FakeSynchronizer:
+            download_count = 0
+
+            def __init__(self, canvas, **kwargs):
+                self.synced = []
+
+            def sync_course(self, course):
+                if course.id in errors:
+                    raise errors[course.id]
+                self.synced.append(course.id)
+                return 1
+
+            def summary(self):
+                return ""
+
+        synchronizers = []
+
+        def make_synchronizer(*args, **kwargs):
+            synchronizers.append(FakeSynchronizer(*args, **kwargs))
+            return synchronizers[-1]
+
+        monkeypatch.setattr("cansync.watch.Synchronizer", make_synchronizer)
+        canvas = make_canvas([1, 2], {})
+        disconnected = []
+        canvas.connected = True
+        canvas.session = None
+        canvas.reload_config = lambda: None
+        canvas.disconnect = lambda: disconnected.append(True)
+        canvas.get_course = lambda course_id: SimpleNamespace(
+            id=course_id, name=str(course_id)
+        )
+        watcher = Watcher(canvas, interval=0, full_every=1)
+
+        watcher.poll()
+        assert synchronizers[-1].synced == [2]
+        assert not disconnected
+
+        canvas.local_config["course_ids"] = [3, 2]
+        watcher.poll()
+        assert synchronizers[-1].synced == []
+        assert disconnected